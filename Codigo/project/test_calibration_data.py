@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+from unified_noise_model.Unified_Noise_Model import Unified_Noise_Model
+
+
+def test_missing_decoherence_times():
+    '''The missing times take the scaled time of the first qubit scaled again, as the original
+    per qubit loop did.'''
+    unm = Unified_Noise_Model()
+    unm.qubits = [0, 1, 2]
+    unm.calibration_data = pd.DataFrame({
+        'T1': [100.0, np.nan, 300.0],
+        'T2': [50.0, 150.0, np.nan],
+    })
+
+    unm._getDecoherenceTimes(verbose=False)
+
+    np.testing.assert_allclose(unm.T1s, [100e-6 * 1.6, 100e-6 * 1.6 * 1.6, 300e-6 * 1.6])
+    np.testing.assert_allclose(unm.T2s, [50e-6 * 1.6, 150e-6 * 1.6, 50e-6 * 1.6 * 1.6])
@@ -0,0 +1,46 @@
+from qiskit import QuantumCircuit
+from qiskit.circuit.library import RYGate
+from unified_noise_model.transpile_cache import Transpile_Cache
+
+
+def _getCircuit():
+    '''Returns a circuit with a custom multi controlled gate, whose qpy name has a random uuid.'''
+    circuit = QuantumCircuit(3, 1)
+    circuit.h(0)
+    circuit.append(RYGate(0.3).control(2, ctrl_state='01'), [0, 1, 2])
+    circuit.measure(2, 0)
+    return circuit
+
+
+def test_same_circuit_hits(tmp_path):
+    cache = Transpile_Cache(directory=str(tmp_path))
+    circuit = _getCircuit()
+
+    first = cache.transpile(circuit, basis_gates=['rz', 'sx', 'x', 'cx'])
+    second = cache.transpile(circuit, basis_gates=['rz', 'sx', 'x', 'cx'])
+
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['hits'] == 1
+    assert second == first
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_rebuilt_circuit_hits():
+    cache = Transpile_Cache()
+    cache.transpile(_getCircuit(), basis_gates=['rz', 'sx', 'x', 'cx'])
+    cache.transpile(_getCircuit(), basis_gates=['rz', 'sx', 'x', 'cx'])
+
+    assert cache.stats()['hits'] == 1
+
+
+def test_different_circuits_miss():
+    cache = Transpile_Cache()
+    circuit = _getCircuit()
+    other_circuit = _getCircuit()
+    other_circuit.x(1)
+
+    cache.transpile(circuit, basis_gates=['rz', 'sx', 'x', 'cx'])
+    cache.transpile(other_circuit, basis_gates=['rz', 'sx', 'x', 'cx'])
+    cache.transpile(circuit, basis_gates=['rz', 'sx', 'x', 'cx'], optimization_level=2)
+
+    assert cache.stats()['misses'] == 3
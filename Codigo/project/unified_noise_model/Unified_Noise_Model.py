@@ -1,22 +1,78 @@
 from qiskit import Aer
-from qiskit import QuantumRegister
-from qiskit_aer.noise import NoiseModel, depolarizing_error, pauli_error, thermal_relaxation_error
+from qiskit import QuantumCircuit, QuantumRegister
+from qiskit_aer import AerSimulator
+from qiskit_aer.noise import NoiseModel, QuantumError, ReadoutError, pauli_error
+from qiskit.quantum_info import Kraus, SuperOp, pauli_basis, process_fidelity
 import pandas
 import numpy as np
-import math
+import json
+import os
+import pickle
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import itertools
+import time
+
+try:
+    from .channel_cache import default_channel_cache
+    from .transpile_cache import default_transpile_cache
+    from .profiling import Profile_Report, get_max_rss_mb, profiled
+    from .readout_mitigation import apply_readout_errors
+except ImportError:
+    # imported as a top level module from its directory, like in the conference notebook
+    from channel_cache import default_channel_cache
+    from transpile_cache import default_transpile_cache
+    from profiling import Profile_Report, get_max_rss_mb, profiled
+    from readout_mitigation import apply_readout_errors
+
+# structured array with the calibration data of each coupled pair of qubits
+EDGE_DTYPE = np.dtype(
+    [('src', np.int32), ('dst', np.int32), ('error', float), ('gate_time', float)],
+)
+
+# version of the format of the files written by save_snapshot
+SNAPSHOT_VERSION = 1
+
+# factor to convert the gate lengths of the backend properties to nanoseconds
+TIME_UNITS_TO_NS = {'s': 10**9, 'ms': 10**6, 'us': 10**3, 'µs': 10**3, 'ns': 1}
+
+# noise stages of the calibration path that can be swept, in the order they are added to the model
+SWEEP_STAGES = ('depolarizing', 'spam', 't1t2')
 
 class Unified_Noise_Model:
     """Unified Noise model"""
 
-    def __init__(self):
-        """Create and empty noise model."""
+    def __init__(self, channel_cache=None, transpile_cache=None):
+        """Create and empty noise model.
+
+        Args:
+            channel_cache(Channel_Cache): cache used to create the channels. If None, the cache
+                                         shared by all the models is used.
+            transpile_cache(Transpile_Cache): cache used by transpile. If None, the cache shared by
+                                             all the models is used.
+        """
         self.noise_model = NoiseModel()
+        # errors added to the noise model, as dict[(instruction, qubits)] = [errors]. The qubits of
+        # the all-qubit errors are None.
+        self.quantum_errors = {}
+        # classical readout errors added to the noise model, as dict[qubit] = ReadoutError
+        self.readout_errors = {}
+        self.channel_cache = default_channel_cache if channel_cache is None else channel_cache
+        self.transpile_cache = (
+            default_transpile_cache if transpile_cache is None else transpile_cache
+        )
 
         self.one_qubit_gates_depolarizing_noise_channel = None
         self.two_qubits_gates_depolarizing_noise_channel = None
 
         self.one_qubit_gates_relaxation_dephasing_noise_channel = []
-        self.two_qubits_gates_relaxation_dephasing_noise_channel = []
+        self.two_qubits_gates_relaxation_dephasing_noise_channel = {}
+
+        # assignment matrices of the classical readout errors, float[qubits][2][2]
+        self.readout_assignment_matrices = None
+        # True if the measurement error is added as classical readout errors
+        self.classical_readout = False
 
         # calibration data attributes
         self.device_to_simulate = None
@@ -34,6 +90,19 @@ class Unified_Noise_Model:
         self.T1s = None
         self.T2s = None
 
+        self.edges = None
+        self.readout_lengths = None
+
+        self.calibration_hash = None
+        self.device_properties = None
+        self.properties_hash = None
+        self.single_qubit_gates_times = None
+        self.two_qubits_gates_times = None
+
+        # profiling data, see profile_report
+        self.stage_timings = {}
+        self.run_timings = []
+
     #-------------CALIBRATION DATA------------------------
     
     def print_calibration_data(self):
@@ -59,197 +128,537 @@ class Unified_Noise_Model:
         print('T2s:')
         print(self.T2s)
 
-    def add_calibration_data(self,path,single_qubit_basis_gates,two_qubits_basis_gates,device_to_simulate):
-        '''Imports the error rates of the machine as the downloaded csv file. path - the path to the csv file, including
-        the name of the csv file and ".csv".'''
+    @profiled
+    def add_calibration_data(self,path,single_qubit_basis_gates,two_qubits_basis_gates,
+                             device_to_simulate=None,properties=None,verbose=True):
+        '''Imports the error rates of the machine as the downloaded csv file. path - the path to
+        the csv file, including the name of the csv file and ".csv".
+
+        The per qubit quantities are saved as numpy arrays in the order of self.qubits, and the two
+        qubits quantities as the structured array self.edges, with fields (src, dst, error,
+        gate_time).
+
+        The gates execution times are read from properties, which can be a BackendProperties, its
+        dict or the path to a json file saved with save_device_properties. If it is None, the
+        properties of device_to_simulate are fetched once.
+
+        If verbose is False, the check of the decoherence times is only printed when it fails.'''
     
         colnames = ["Qubit", "Frequency", "T1", "T2", "ReadoutError", "SQError", "TQError"]
 
-        self.noise_model = NoiseModel(basis_gates=(single_qubit_basis_gates+two_qubits_basis_gates))
+        self._resetNoiseModel(single_qubit_basis_gates, two_qubits_basis_gates)
         self.device_to_simulate = device_to_simulate
-        self.single_qubit_basis_gates = single_qubit_basis_gates
-        self.two_qubits_basis_gates = two_qubits_basis_gates
 
-        self.calibration_data = pandas.read_csv(path)
+        with self._profileStage('read_csv'):
+            self.calibration_data = pandas.read_csv(path)
+        self.calibration_hash = self._getFileHash(path)
 
         self._getQubits()
         self._getSingleQubitErrorRates()
         self._getTwoQubitErrorRates()
         self._getMeasureErrorRates()
-        self._getDecoherenceTimes()
+        self._getDecoherenceTimes(verbose)
+
+        self._setProperties(self._loadProperties(properties, device_to_simulate))
+
+    def add_calibration_arrays(self, qubits, single_qubit_basis_gates, two_qubits_basis_gates,
+                               single_qubit_error_rates, measurement_error_rates, T1s, T2s, edges,
+                               readout_lengths=None, properties=None, calibration_hash=None):
+        '''Sets the calibration data from arrays already parsed, as saved by add_calibration_data,
+        without reading a csv file.
+
+        Args:
+            qubits(list[int]): physical qubits.
+            single_qubit_error_rates(ndarray): float[qubits] single qubit error rates.
+            measurement_error_rates(ndarray): float[qubits] measurement error rates.
+            T1s(ndarray): float[qubits] T1 times, in seconds.
+            T2s(ndarray): float[qubits] T2 times, in seconds.
+            edges(ndarray): EDGE_DTYPE structured array with the two qubits error rates and gate
+                            times.
+            readout_lengths(ndarray): float[qubits] readout lengths in nanoseconds, or None.
+            properties: device properties with the gates times, as in add_calibration_data.
+            calibration_hash(str): hash of the calibration file of the arrays, if any, used to
+                                   validate the snapshots.
+        '''
+        self._resetNoiseModel(single_qubit_basis_gates, two_qubits_basis_gates)
+        self.device_to_simulate = None
+        self.calibration_data = None
+        self.calibration_hash = calibration_hash
 
+        self.qubits = list(qubits)
+        self.single_qubit_error_rates = np.asarray(single_qubit_error_rates, dtype=float)
+        self.measurement_error_rates = np.asarray(measurement_error_rates, dtype=float)
+        self.T1s = np.asarray(T1s, dtype=float)
+        self.T2s = np.asarray(T2s, dtype=float)
+        self.readout_lengths = (
+            None if readout_lengths is None else np.asarray(readout_lengths, dtype=float)
+        )
+        self.edges = np.asarray(edges, dtype=EDGE_DTYPE)
+        keys = [str(src) + '_' + str(dst) for src, dst in zip(self.edges['src'].tolist(),
+                                                               self.edges['dst'].tolist())]
+        self.two_qubits_error_rates = dict(zip(keys, self.edges['error'].tolist()))
+
+        self._setProperties(self._loadProperties(properties, None))
+
+    def _resetNoiseModel(self, single_qubit_basis_gates, two_qubits_basis_gates):
+        '''Starts an empty noise model over the basis gates, dropping the channels and readout
+        errors of the previous calibration data.'''
+        self.noise_model = NoiseModel(basis_gates=(single_qubit_basis_gates+two_qubits_basis_gates))
+        self.quantum_errors = {}
+        self.readout_errors = {}
+        self.readout_assignment_matrices = None
+        self.classical_readout = False
+        self.single_qubit_basis_gates = single_qubit_basis_gates
+        self.two_qubits_basis_gates = two_qubits_basis_gates
+
+    def _setProperties(self, properties):
+        '''Saves the backend properties dict, its hash and the gates execution times read from
+        it.'''
+        self.device_properties = properties
+        self.properties_hash = self._getPropertiesHash(properties)
+        self._getGateExecutionTimes(properties)
+
+    @staticmethod
+    def _loadProperties(properties, device_to_simulate):
+        '''Returns the backend properties as a dict. properties can be a BackendProperties, its
+        dict, the path to a json file saved with save_device_properties or None, to fetch the
+        properties of device_to_simulate, if any.'''
+        if properties is None and device_to_simulate is not None:
+            properties = device_to_simulate.properties()
+        if isinstance(properties, (str, os.PathLike)):
+            with open(properties) as file:
+                properties = json.load(file)
+        elif properties is not None and not isinstance(properties, dict):
+            properties = properties.to_dict()
+        return properties
+
+    @staticmethod
+    def _getPropertiesHash(properties):
+        '''Returns the sha256 hash of the json serialization of the backend properties dict, or None
+        if there are no properties.'''
+        if properties is None:
+            return None
+        serialized_properties = json.dumps(properties, sort_keys=True, default=str)
+        return hashlib.sha256(serialized_properties.encode()).hexdigest()
+
+    @profiled
     def _getQubits(self):
+        self.calibration_data = self.calibration_data.sort_values('Qubit', ignore_index=True)
         self.qubits = self.calibration_data.Qubit.tolist()
-        #for i in range(0, len(self.qubits)):
-        #    self.qubits[i] = ("Q" + str(self.qubits[i]))       
 
+        if 'Readout length (ns)' in self.calibration_data:
+            self.readout_lengths = self.calibration_data['Readout length (ns)'].to_numpy(
+                dtype=float,
+            )
+
+    @profiled
     def _getSingleQubitErrorRates(self):
-        '''Returns as a dictionary the single qubit error rates, as they appear on ibmq_16_melbourne. NOTE: the 
-        values deviate every time the machine gets callibrated.'''
-        rates = self.calibration_data.SQError.tolist()
+        '''Saves as an array the single qubit error rates, as they appear on ibmq_16_melbourne.
+        NOTE: the values deviate every time the machine gets callibrated.'''
+        rates = self.calibration_data.SQError.to_numpy(dtype=float)
+        self.single_qubit_error_rates = np.nan_to_num(rates, nan=0)
+    
+    @profiled
+    def _getTwoQubitErrorRates(self):
+        '''Saves the two qubit error rates, as they appear on ibmq_16_melbourne, in the structured
+        array self.edges together with the gate times of the "Gate time (ns)" column. They are also
+        saved as a dictionary with "qubit_secondqubit" keys. NOTE: the values deviate every time the
+        machine gets callibrated.'''
+        rates = self._parseQubitsPairsColumn('TQError')
 
-        for i in range(len(rates)):
-            if(not math.isnan(rates[i])):
-                rates[i] = float(rates[i])
-            else:
-                rates[i] = 0
+        if 'Gate time (ns)' in self.calibration_data:
+            gate_times = self._parseQubitsPairsColumn('Gate time (ns)')
+            rates = rates.merge(gate_times, on=['src', 'dst'], how='left', suffixes=('', '_time'))
+            gate_time = rates['value_time'].to_numpy(dtype=float)
+        else:
+            gate_time = np.full(len(rates), np.nan)
 
+        edges = np.empty(len(rates), dtype=EDGE_DTYPE)
+        edges['src'] = rates['src'].to_numpy()
+        edges['dst'] = rates['dst'].to_numpy()
+        edges['error'] = rates['value'].to_numpy(dtype=float) * 0.6
+        edges['gate_time'] = gate_time
+        self.edges = edges
 
-        self.single_qubit_error_rates = dict(zip(self.qubits, rates))
-    
-    def _getTwoQubitErrorRates(self):
-        '''Returns as a dictionary the two qubit error rates, as they appear on ibmq_16_melbourne. NOTE: the values 
-        deviate every time the machine gets callibrated.'''
-        rates = self.calibration_data.TQError.tolist()
-        qpairs = []
-        qvals = []
-        for i in range(0, len(rates)):
-            if(type(rates[i]) == str):
-                s = rates[i].split(";")
-                for j in range(0, len(s)):
-                    t = s[j].split(":")
-                    qpairs.append(t[0])
-                    qvals.append(float(t[1]) * 0.6)
-            
+        keys = rates['src'].astype(str) + '_' + rates['dst'].astype(str)
+        self.two_qubits_error_rates = dict(zip(keys, edges['error'].tolist()))
 
+    def _parseQubitsPairsColumn(self, column):
+        '''Returns as a DataFrame with src, dst and value columns a column of the calibration data
+        whose cells have the "qubit_secondqubit:value;qubit_secondqubit:value" format.'''
+        pairs = self.calibration_data[column].dropna().astype(str).str.split(';').explode()
+        pairs = pairs.str.strip()
+        pairs = pairs[pairs != ''].str.split(':', n=1, expand=True)
+        if pairs.empty:
+            return pandas.DataFrame({
+                'src': np.array([], dtype=int),
+                'dst': np.array([], dtype=int),
+                'value': np.array([], dtype=float),
+            })
+
+        qubits = pairs[0].str.split('_', n=1, expand=True)
+        return pandas.DataFrame({
+            'src': qubits[0].astype(int).to_numpy(),
+            'dst': qubits[1].astype(int).to_numpy(),
+            'value': pairs[1].astype(float).to_numpy(),
+        })
     
-        self.two_qubits_error_rates = dict(zip(qpairs, qvals))
-    
+    @profiled
     def _getMeasureErrorRates(self):
-        '''Returns as a dictionary the measurement error rates, as they appear on ibmq_16_melbourne. NOTE: the values
-        deviate every time the machine gets callibrated'''
-        rates = self.calibration_data.ReadoutError.tolist()
-        #del rates[0]
-        for i in range(len(rates)):
-            if(not math.isnan(rates[i])):
-                rates[i] = float(rates[i]) * 0.6
-            else:
-                rates[i] = 0
-        self.measurement_error_rates = dict(zip(self.qubits, rates))
+        '''Saves as an array the measurement error rates, as they appear on ibmq_16_melbourne.
+        NOTE: the values deviate every time the machine gets callibrated'''
+        rates = self.calibration_data.ReadoutError.to_numpy(dtype=float)
+        self.measurement_error_rates = np.nan_to_num(rates * 0.6, nan=0)
     
-    def _getDecoherenceTimes(self):
-        '''Returns the thermal relaxation time T1 and the qubit dephasing time T2, as given by IBMQ.'''
-        t1er = self.calibration_data.T1.tolist()
-        t2er = self.calibration_data.T2.tolist()
-
-        for i in range(0, len(t1er)):
-            if(not math.isnan(t1er[i])):
-                t1er[i] = (float(t1er[i]) / float(1000000)) * 1.6
-            else:
-                t1er[i] = (t1er[0]) * 1.6
-            if(not math.isnan(t2er[i])):
-                t2er[i] = (float(t2er[i]) / float(1000000)) * 1.6
-            else:
-                t2er[i] = (t2er[0]) * 1.6
+    @profiled
+    def _getDecoherenceTimes(self, verbose=True):
+        '''Saves the thermal relaxation time T1 and the qubit dephasing time T2, as given by IBMQ.
+        The missing values are replaced by the ones of the first qubit. The incompatible times are
+        always printed, the successful check only if verbose.'''
+        T1s = self.calibration_data.T1.to_numpy(dtype=float) / float(1000000) * 1.6
+        T2s = self.calibration_data.T2.to_numpy(dtype=float) / float(1000000) * 1.6
 
-        T1s = np.array(t1er)
-        T2s = np.array(t2er)
+        # the missing values take the already scaled time of the first qubit scaled again, as the
+        # original per qubit loop did
+        T1s = np.where(np.isnan(T1s), T1s[0] * 1.6, T1s)
+        T2s = np.where(np.isnan(T2s), T2s[0] * 1.6, T2s)
     
         # Check for error in IBMQ's measurements (i.e it must always be T2 <= 2T1)
-        c = 0
-        for i in range(0,len(T1s)):
-            if (T2s[i] > 2*T1s[i]):
-                c = 1
-                print("ERROR: incompatible decay rates - Qubit Q" + str(i) + ", T2 =", T2s[i], "and T1 =", T1s[i])
-            if (c == 0):
-                print(r'Checking decoherence times: all ok')
+        incompatible = np.flatnonzero(T2s > 2*T1s)
+        for i in incompatible:
+            print(
+                "ERROR: incompatible decay rates - Qubit Q" + str(self.qubits[i]) + ", T2 =",
+                T2s[i], "and T1 =", T1s[i],
+            )
+        if len(incompatible) == 0 and verbose:
+            print(r'Checking decoherence times: all ok')
         
         self.T1s = T1s
         self.T2s = T2s
 
-    def _getSQGateExecutionTime(self,gate):
-        '''Returns the average execution time of the single-qubit type gates we are interested in.'''
-        # Single qubit gates
-        s = [0]*len(self.qubits)
-        for i in range(0,len(self.qubits)):
-            s[i] = self.device_to_simulate.properties().gate_length(gate, [i])
+    @profiled
+    def _getGateExecutionTimes(self, properties):
+        '''Saves the execution times (in nanoseconds) of the basis gates, reading the backend
+        properties in a single pass. The single qubit gates times are saved as a
+        float[qubits][gates] array, and the two qubits gates times as a float[edges][gates] array,
+        in the order of self.edges. The two qubits gates without properties take the time of the
+        "Gate time (ns)" column of the calibration data.'''
+        self.single_qubit_gates_times = np.full(
+            (len(self.qubits), len(self.single_qubit_basis_gates)), np.nan,
+        )
+        self.two_qubits_gates_times = np.repeat(
+            self.edges['gate_time'][:, np.newaxis], len(self.two_qubits_basis_gates), axis=1,
+        )
+        if properties is None:
+            return
+
+        qubits_index = {qubit: i for i, qubit in enumerate(self.qubits)}
+        edges = zip(self.edges['src'].tolist(), self.edges['dst'].tolist())
+        edges_index = {edge: i for i, edge in enumerate(edges)}
+        single_qubit_gates_index = {
+            gate: i for i, gate in enumerate(self.single_qubit_basis_gates)
+        }
+        two_qubits_gates_index = {gate: i for i, gate in enumerate(self.two_qubits_basis_gates)}
+
+        for gate in properties.get('gates', []):
+            gate_length = None
+            for parameter in gate.get('parameters', []):
+                if parameter['name'] == 'gate_length':
+                    units_to_ns = TIME_UNITS_TO_NS.get(parameter.get('unit', 's'), 1)
+                    gate_length = parameter['value'] * units_to_ns
+            if gate_length is None:
+                continue
+
+            name = gate['gate']
+            qubits = tuple(gate['qubits'])
+            if (len(qubits) == 1 and name in single_qubit_gates_index
+                    and qubits[0] in qubits_index):
+                self.single_qubit_gates_times[
+                    qubits_index[qubits[0]], single_qubit_gates_index[name]
+                ] = gate_length
+            elif len(qubits) == 2 and name in two_qubits_gates_index and qubits in edges_index:
+                self.two_qubits_gates_times[
+                    edges_index[qubits], two_qubits_gates_index[name]
+                ] = gate_length
+
+    def save_device_properties(self, path):
+        '''Saves the backend properties used by add_calibration_data as a json file, so that it can
+        be passed as properties instead of the device to simulate.'''
+        with open(path, 'w') as file:
+            json.dump(self.device_properties, file, default=str)
+
+    def get_coupling_map(self):
+        '''Returns the coupling map of the device as a list of [qubit, second_qubit] edges, derived
+        from the two qubits error rates of the calibration data.'''
+        return np.column_stack((self.edges['src'], self.edges['dst'])).tolist()
 
-        return (np.mean(s)*(10**9))
+    def get_log_fidelities(self):
+        '''Returns the log fidelities, log(1 - error rate), of the calibration data indexed by
+        physical qubit, with -inf for the qubits and edges without calibration data.
 
-    def _getTQGateExecutionTime(self,gate):
-        '''Returns the average execution time of the two-qubit type gates in the circuit.'''
-        # Two qubit gates
+        Returns:
+            tuple: the single qubit gates and the measurements log fidelities, float[qubits], and
+            the two qubits gates log fidelities, float[qubits][qubits], set in both directions of
+            each edge (the direction given in the calibration data takes precedence).
+        '''
+        qubits = np.asarray(self.qubits)
+        num_qubits = int(qubits.max()) + 1
 
-        t = [0]*len(self.two_qubits_error_rates)
-        two_qubits_error_rates_keys = self.two_qubits_error_rates.keys()
-        qubits = []
-        for key in two_qubits_error_rates_keys:
-            key = key.split('_')
-            for i in range(len(key)):
-                key[i] = int(key[i])
-        for i in range(0,len(self.two_qubits_error_rates)):
-            t[i] = self.device_to_simulate.properties().gate_length(gate,key)
+        single_qubit_log_fidelities = np.full(num_qubits, -np.inf)
+        single_qubit_log_fidelities[qubits] = np.log1p(-np.asarray(self.single_qubit_error_rates))
+        readout_log_fidelities = np.full(num_qubits, -np.inf)
+        readout_log_fidelities[qubits] = np.log1p(-np.asarray(self.measurement_error_rates))
 
-        return (np.mean(t)*(10**9))
+        two_qubits_log_fidelities = np.full((num_qubits, num_qubits), -np.inf)
+        src = self.edges['src']
+        dst = self.edges['dst']
+        edge_log_fidelities = np.log1p(-self.edges['error'].astype(float))
+        two_qubits_log_fidelities[dst, src] = edge_log_fidelities
+        two_qubits_log_fidelities[src, dst] = edge_log_fidelities
+
+        return single_qubit_log_fidelities, readout_log_fidelities, two_qubits_log_fidelities
+
+    @staticmethod
+    def get_circuit_instructions(circuit):
+        '''Returns the instructions of a circuit, without its barriers, as their names, list[str],
+        and the indexes of their qubit and second qubit, int[instructions][2], with the qubit
+        repeated for the single qubit instructions.
+
+        Raises:
+            ValueError: if the circuit has an instruction over more than two qubits.
+        '''
+        qubits_index = {qubit: i for i, qubit in enumerate(circuit.qubits)}
+        # the name of each operation object, as the transpiled circuits share the gates objects and
+        # the name of the controlled gates, like cx, is computed on each access
+        operations_names = {}
+        names = []
+        # flat lists of ints, as a tuple for each instruction would trigger the garbage collector,
+        # which traverses all the objects of the circuits
+        first_qubits = []
+        second_qubits = []
+        for instruction in circuit.data:
+            operation = instruction.operation
+            name = operations_names.get(id(operation))
+            if name is None:
+                name = operations_names[id(operation)] = operation.name
+            if name == 'barrier':
+                continue
+            instruction_qubits = instruction.qubits
+            if len(instruction_qubits) > 2:
+                raise ValueError(
+                    'Only instructions over one or two qubits are supported, got ' + name + '.',
+                )
+            names.append(name)
+            first_qubits.append(qubits_index[instruction_qubits[0]])
+            second_qubits.append(qubits_index[instruction_qubits[-1]])
+
+        return names, np.array([first_qubits, second_qubits], dtype=np.int64).T.reshape(-1, 2)
 
     #---------------
-    def add_all_noise_channels2(self):
+    @profiled
+    def add_all_noise_channels2(self, classical_readout=False):
+        '''Adds the depolarizing, SPAM and relaxation and dephasing channels.
+
+        Args:
+            classical_readout(bool): if True, the measurement error is added as classical readout
+                                     errors (add_readout_error_channel2) instead of a quantum
+                                     channel on the measure instruction (add_spam_channel2).
+        '''
         self.add_depolarizing_channel2()
-        self.add_spam_channel2()
+        if classical_readout:
+            self.add_readout_error_channel2()
+        else:
+            self.add_spam_channel2()
         self.add_relaxation_dephasing_channel2()
 
+    @profiled
     def add_depolarizing_channel2(self):
+        '''Adds the depolarizing channel, using the single qubit error rate of each qubit and the
+        two qubits error rate of each edge.'''
+        self._addQuantumErrors(
+            self._getDepolarizingErrors(self.qubits, self.single_qubit_error_rates, self.edges),
+        )
+
+    def _getDepolarizingErrors(self, qubits, single_qubit_error_rates, edges):
+        '''Returns the depolarizing errors of some qubits, with their single qubit error rates, and
+        of some edges, as a structured array like self.edges, as a dict like self.quantum_errors.'''
+        errors = {}
         # add 1Q noise
-        for qubit in self.qubits:
-            error = depolarizing_error(self.single_qubit_error_rates[qubit], 1)
-            self.noise_model.add_quantum_error(error,self.single_qubit_basis_gates,[qubit])
+        for qubit, rate in zip(qubits, single_qubit_error_rates):
+            error = self.channel_cache.depolarizing_error(rate, 1)
+            self._setError(errors, error, self.single_qubit_basis_gates, [qubit])
 
-        keys = self.two_qubits_error_rates.keys()
-        keys_used = {}
+        noisy_two_qubits_gates = self.get_noisy_two_qubits_gates()
+        edges_used = set()
         # add 2Q noise
-        for qubits_pair in keys:
-            qubits = qubits_pair.split('_')
-            inverse_qubits_pair = qubits[1] + '_' + qubits[0]
-
-            if(qubits_pair in keys_used or inverse_qubits_pair in keys_used):
+        for src, dst, rate in zip(edges['src'].tolist(), edges['dst'].tolist(),
+                                  edges['error'].tolist()):
+            if((src, dst) in edges_used or (dst, src) in edges_used):
                 continue
             
-            keys_used[qubits_pair] = 1
-            keys_used[inverse_qubits_pair] = 1
-            
-            aux_two_qubits_basis_gates = []
-            for i in range(len(self.two_qubits_basis_gates)):
-                if self.two_qubits_basis_gates[i] == 'ecr':
-                    aux_two_qubits_basis_gates.append('cx')
-                else:
-                    aux_two_qubits_basis_gates[i].append(self.two_qubits_basis_gates[i])
-
-            error = depolarizing_error(self.two_qubits_error_rates[qubits_pair], 2)
-            self.noise_model.add_quantum_error(error,aux_two_qubits_basis_gates,[int(qubits[0]),int(qubits[1])])
+            edges_used.add((src, dst))
+
+            error = self.channel_cache.depolarizing_error(rate, 2)
+            self._setError(errors, error, noisy_two_qubits_gates, [src, dst])
+
+        return errors
+
+    def get_noisy_two_qubits_gates(self):
+        '''Returns the two qubits basis gates to which add noise. Mitiq doesnt support ECR, so the
+        circuits are transpiled with cx instead of ecr, and the noise of ecr is added to cx.'''
+        aux_two_qubits_basis_gates = []
+        for gate in self.two_qubits_basis_gates:
+            if gate == 'ecr':
+                aux_two_qubits_basis_gates.append('cx')
+            else:
+                aux_two_qubits_basis_gates.append(gate)
+
+        return aux_two_qubits_basis_gates
     
+    @profiled
     def add_spam_channel2(self):
-        for qubit in self.qubits:
-            error = pauli_error([("X", self.measurement_error_rates[qubit]), ("I", 1 - self.measurement_error_rates[qubit])])
-            self.noise_model.add_quantum_error(error,"measure",[qubit])
+        '''Adds the SPAM channel, a bit flip on the measure instruction of each qubit with its
+        measurement error rate.'''
+        self._addQuantumErrors(self._getSpamErrors(self.qubits, self.measurement_error_rates))
+
+    def _getSpamErrors(self, qubits, measurement_error_rates):
+        '''Returns the SPAM errors of some qubits, with their measurement error rates, as a dict
+        like self.quantum_errors.'''
+        errors = {}
+        for qubit, rate in zip(qubits, measurement_error_rates):
+            error = self.channel_cache.pauli_error([("X", rate), ("I", 1 - rate)])
+            self._setError(errors, error, "measure", [qubit])
+        return errors
+
+    @profiled
+    def add_readout_error_channel2(self):
+        '''Adds the measurement error of each qubit as a classical readout error, which flips the
+        recorded bit with the measurement error rate instead of applying a channel on the measure
+        instruction. Its assignment matrices are saved in self.readout_assignment_matrices, where
+        matrix[i][j] is the probability of recording j when the qubit is in the state i.'''
+        self.classical_readout = True
+        self.readout_assignment_matrices = self._getAssignmentMatrices(self.measurement_error_rates)
+        readout_errors = self._getReadoutErrors(self.qubits, self.measurement_error_rates)
+        for qubit, error in readout_errors.items():
+            self._addReadoutError(error, qubit)
+
+    def _getReadoutErrors(self, qubits, measurement_error_rates):
+        '''Returns the classical readout errors of some qubits, with their measurement error rates,
+        as a dict like self.readout_errors.'''
+        errors = {}
+        for qubit, matrix in zip(qubits, self._getAssignmentMatrices(measurement_error_rates)):
+            error = ReadoutError(matrix)
+            if not error.ideal():
+                errors[qubit] = error
+        return errors
+
+    @staticmethod
+    def _getAssignmentMatrices(measurement_error_rates):
+        '''Returns the symmetric assignment matrices of some measurement error rates,
+        float[qubits][2][2].'''
+        rates = np.asarray(measurement_error_rates, dtype=float)
+        return np.stack([
+            np.column_stack((1 - rates, rates)),
+            np.column_stack((rates, 1 - rates)),
+        ], axis=1)
 
+    def get_readout_assignment_matrices(self, qubits=None):
+        '''Returns the assignment matrices of the readout errors of some physical qubits,
+        float[qubits][2][2], with the identity for the qubits without readout error.
+
+        Args:
+            qubits(list[int]): physical qubits, like the measured qubit of each clbit. If None, the
+                               qubits of the calibration data. None entries give the identity.
+        '''
+        if qubits is None:
+            qubits = self.qubits
+        matrices = np.tile(np.eye(2), (len(qubits), 1, 1))
+        for i, qubit in enumerate(qubits):
+            if qubit in self.readout_errors:
+                matrices[i] = self.readout_errors[qubit].probabilities
+        return matrices
+
+    @profiled
     def add_relaxation_dephasing_channel2(self):
-        # instructions times (in nanoseconds)
-        avg_SQGateExecutionTime = []
-        for gate in self.single_qubit_basis_gates:
-            avg_SQGateExecutionTime.append(self._getSQGateExecutionTime(gate))
-        avg_TQGateExecutionTime = []
-        for gate in self.two_qubits_basis_gates:
-            avg_TQGateExecutionTime.append(self._getTQGateExecutionTime(gate))
+        '''Adds the relaxation and dephasing channel, using the T1 and T2 of each qubit and the
+        execution time of each gate over its qubit or edge. The two qubits gates noise is only added
+        over the edges of the calibration data. Each distinct channel is created once, through the
+        channel cache.
+
+        Raises:
+            ValueError: if the execution times of the gates are unknown. They are read from the
+                        device to simulate or the properties given to add_calibration_data.
+        '''
+        self._addQuantumErrors(
+            self._getRelaxationDephasingErrors(
+                self.qubits,
+                self.T1s,
+                self.T2s,
+                self.single_qubit_gates_times,
+                self.readout_lengths,
+                self.edges,
+                self.two_qubits_gates_times,
+            ),
+            warnings=False,
+        )
+
+    def _getRelaxationDephasingErrors(self, qubits, T1s, T2s, single_qubit_gates_times,
+                                      readout_lengths, edges, two_qubits_gates_times):
+        '''Returns the relaxation and dephasing errors of some qubits and of some edges between
+        them, as a dict like self.quantum_errors. The arguments are like the attributes of the model
+        with the same names, restricted to the qubits and edges.
+
+        Raises:
+            ValueError: if the execution times of the gates are unknown.
+        '''
+        if np.isnan(single_qubit_gates_times).any() or np.isnan(two_qubits_gates_times).any():
+            raise ValueError(
+                'Unknown gates execution times, add the calibration data with the device to '
+                'simulate or its properties.',
+            )
+
+        errors = {}
+        # instructions times (in nanoseconds), T1 and T2 are converted from seconds to nanoseconds
+        T2s = np.minimum(T2s, 2 * T1s) * 10**9
+        T1s = T1s * 10**9
         time_reset = 1000  # 1 microsecond
-        time_measure = 1000 # 1 microsecond
-
-        # QuantumError objects
-        errors_measure = [thermal_relaxation_error(t1, t2, time_measure)
-                  for t1, t2 in zip(self.T1s, self.T2s)]
-        errors_reset = [thermal_relaxation_error(t1, t2, time_reset)
-                for t1, t2 in zip(self.T1s, self.T2s)]
-        SQerrors = []
-        for i in range(len(self.single_qubit_basis_gates)):
-            SQerrors.append([thermal_relaxation_error(t1, t2, avg_SQGateExecutionTime[i])
-              for t1, t2 in zip(self.T1s, self.T2s)])
-        TQerrors = []
-        for i in range(len(self.two_qubits_error_rates)):
-            TQerrors.append([thermal_relaxation_error(t1, t2, avg_TQGateExecutionTime[0])
-              for t1, t2 in zip(self.T1s, self.T2s)])
+        if readout_lengths is None:
+            times_measure = np.full(len(qubits), 1000) # 1 microsecond
+        else:
+            times_measure = readout_lengths
+
+        # 1Q noise, over measure, reset and the single qubit gates
+        for i, qubit in enumerate(qubits):
+            error = self.channel_cache.thermal_relaxation_error(T1s[i], T2s[i], times_measure[i])
+            self._setError(errors, error, "measure", [qubit])
+
+            error = self.channel_cache.thermal_relaxation_error(T1s[i], T2s[i], time_reset)
+            self._setError(errors, error, "reset", [qubit])
+
+            for gate in range(len(self.single_qubit_basis_gates)):
+                error = self.channel_cache.thermal_relaxation_error(
+                    T1s[i], T2s[i], single_qubit_gates_times[i][gate],
+                )
+                self._setError(errors, error, self.single_qubit_basis_gates[gate], [qubit])
 
+        # 2Q noise, only over the edges
+        qubits_index = {qubit: i for i, qubit in enumerate(qubits)}
+        noisy_two_qubits_gates = self.get_noisy_two_qubits_gates()
+        for edge, (src, dst) in enumerate(zip(edges['src'].tolist(), edges['dst'].tolist())):
+            i, j = qubits_index[src], qubits_index[dst]
+            for gate in range(len(noisy_two_qubits_gates)):
+                time = two_qubits_gates_times[edge][gate]
+                error = self.channel_cache.expand(
+                    self.channel_cache.thermal_relaxation_error(T1s[i], T2s[i], time),
+                    self.channel_cache.thermal_relaxation_error(T1s[j], T2s[j], time),
+                )
+                self._setError(errors, error, noisy_two_qubits_gates[gate], [src, dst])
+
+        return errors
 
     #----------
 
+    @profiled
     def add_all_noise_channels(
         self,
         state_preparation_error_prob,
@@ -263,6 +672,7 @@ class Unified_Noise_Model:
         qubits,
         qubits_T1,
         qubits_T2,
+        coupling_map=None,
         ):
         """Add the three noise channels to the UNM:
         1- Depolarizing Channel.
@@ -287,6 +697,10 @@ class Unified_Noise_Model:
             qubits (QuantumRegister): Qubits of the circuit to which add noise.
             qubits_t1: list of floats that represents T1 for each of the qubits.
             qubits_t2: list of floats that represents T2 for each of the qubits.
+            coupling_map: list of [qubit, second_qubit] edges where two qubits gates are noisy. If
+                          None, every ordered pair of different qubits is used. The edges with a
+                          qubit outside of qubits, like most of the edges of get_coupling_map(),
+                          are ignored.
         """
 
         # Creates the depolarizing and relaxation and dephasing channels
@@ -299,6 +713,7 @@ class Unified_Noise_Model:
             one_qubit_gates_times,
             two_qubits_gates,
             two_qubits_gates_times,
+            coupling_map,
         )
 
         # Compose the depolarizing and relaxation and dephasing channels.
@@ -307,23 +722,19 @@ class Unified_Noise_Model:
         # * D() = depolarizing channel
         for qubit in qubits:
             for gate in range(len(one_qubit_gates)):
-                error = self.one_qubit_gates_depolarizing_noise_channel.compose(
+                error = self.channel_cache.compose(
+                    self.one_qubit_gates_depolarizing_noise_channel,
                     self.one_qubit_gates_relaxation_dephasing_noise_channel[qubit][gate],
                 )
-                self.noise_model.add_quantum_error(error, one_qubit_gates[gate], [qubit])
-
-            for second_qubit in qubits:
-                for gate in range(len(two_qubits_gates)):
-                    error = self.two_qubits_gates_depolarizing_noise_channel.compose(
-                        self.two_qubits_gates_relaxation_dephasing_noise_channel[qubit][
-                            second_qubit
-                        ][gate],
-                    )
-                    self.noise_model.add_quantum_error(
-                        error,
-                        two_qubits_gates[gate],
-                        [qubit, second_qubit],
-                    )
+                self._addQuantumError(error, one_qubit_gates[gate], [qubit])
+
+        for edge, errors in self.two_qubits_gates_relaxation_dephasing_noise_channel.items():
+            for gate in range(len(two_qubits_gates)):
+                error = self.channel_cache.compose(
+                    self.two_qubits_gates_depolarizing_noise_channel,
+                    errors[gate],
+                )
+                self._addQuantumError(error, two_qubits_gates[gate], list(edge))
 
         self.add_spam_channel(
             state_preparation_error_prob,
@@ -331,6 +742,7 @@ class Unified_Noise_Model:
             state_preparation_error_gate,
         )
 
+    @profiled
     def add_spam_channel(
         self,
         statePreparation_error_prob=-1,
@@ -357,21 +769,22 @@ class Unified_Noise_Model:
 
         # state preparation errors
         if statePreparation_error_prob >= 0:
-            statePreparation_error = pauli_error(
+            statePreparation_error = self.channel_cache.pauli_error(
                 [("I", statePreparation_error_prob), ("X", 1 - statePreparation_error_prob)],
             )
-            self.noise_model.add_all_qubit_quantum_error(
+            self._addAllQubitQuantumError(
                 statePreparation_error,
                 statePreparation_error_gate.label,
             )
             self.noise_model.add_basis_gates(["x"])
 
         if measurement_error_prob >= 0:
-            measurement_error = pauli_error(
+            measurement_error = self.channel_cache.pauli_error(
                 [("X", measurement_error_prob), ("I", 1 - measurement_error_prob)],
             )
-            self.noise_model.add_all_qubit_quantum_error(measurement_error, "measure")
+            self._addAllQubitQuantumError(measurement_error, "measure")
 
+    @profiled
     def add_depolarizing_channel(
         self,
         depolarizing_prob,
@@ -405,11 +818,11 @@ class Unified_Noise_Model:
         )
 
         # Adds the depolarizing channel to the model
-        self.noise_model.add_all_qubit_quantum_error(
+        self._addAllQubitQuantumError(
             self.one_qubit_gates_depolarizing_noise_channel,
             one_qubit_gates,
         )
-        self.noise_model.add_all_qubit_quantum_error(
+        self._addAllQubitQuantumError(
             self.two_qubits_gates_depolarizing_noise_channel,
             two_qubits_gates,
         )
@@ -436,13 +849,14 @@ class Unified_Noise_Model:
         """
         # Noise to one qubit gates
         if add_one_qubit_gates_noise:
-            error = depolarizing_error(depolarizing_prob, 1)
+            error = self.channel_cache.depolarizing_error(depolarizing_prob, 1)
             self.one_qubit_gates_depolarizing_noise_channel = error
         # Noise to two qubits gates
         if add_two_qubits_gates_noise:
-            error = depolarizing_error(depolarizing_prob, 2)
+            error = self.channel_cache.depolarizing_error(depolarizing_prob, 2)
             self.two_qubits_gates_depolarizing_noise_channel = error
 
+    @profiled
     def add_relaxation_dephasing_channel(
         self,
         qubits: QuantumRegister,
@@ -452,6 +866,7 @@ class Unified_Noise_Model:
         one_qubit_gates_times: list,
         two_qubits_gates: list,
         two_qubits_gates_times: list,
+        coupling_map: list = None,
     ):
         self.create_relaxation_dephasing_channel(
             qubits,
@@ -461,23 +876,17 @@ class Unified_Noise_Model:
             one_qubit_gates_times,
             two_qubits_gates,
             two_qubits_gates_times,
+            coupling_map,
         )
 
         for qubit in qubits:
             for gate in range(len(one_qubit_gates)):
                 error = self.one_qubit_gates_relaxation_dephasing_noise_channel[qubit][gate]
-                self.noise_model.add_quantum_error(error, one_qubit_gates[gate], [qubit])
-
-            for second_qubit in qubits:
-                for gate in range(len(two_qubits_gates)):
-                    error = self.two_qubits_gates_relaxation_dephasing_noise_channel[qubit][
-                        second_qubit
-                    ][gate]
-                    self.noise_model.add_quantum_error(
-                        error,
-                        two_qubits_gates[gate],
-                        [qubit, second_qubit],
-                    )
+                self._addQuantumError(error, one_qubit_gates[gate], [qubit])
+
+        for edge, errors in self.two_qubits_gates_relaxation_dephasing_noise_channel.items():
+            for gate in range(len(two_qubits_gates)):
+                self._addQuantumError(errors[gate], two_qubits_gates[gate], list(edge))
 
     def create_relaxation_dephasing_channel(
         self,
@@ -488,8 +897,10 @@ class Unified_Noise_Model:
         one_qubit_gates_times: list,
         two_qubits_gates: list,
         two_qubits_gates_times: list,
+        coupling_map: list = None,
     ):
-        """Create a relaxation and dephasing channel and save it as a list[qubit][][].
+        """Create a relaxation and dephasing channel. The one qubit gates channels are saved as a
+        list[qubit][gate], and the two qubits gates channels as a dict[(qubit,second_qubit)][gate].
 
         Args:
             qubits (QuantumRegister): Qubits of the circuit to which add noise.
@@ -505,39 +916,804 @@ class Unified_Noise_Model:
             two_qubits_gates_times(float[qubits][gates]):list of execution times
                                                  for each (qubit,double gate).
             !!!DOUBLE_GATES_TIME ESTA ACTUALMENTE SIMPLIFICADO, RECIBE UN FLOAT[]
+            coupling_map: list of [qubit, second_qubit] edges. The two qubits gates channels are
+                          created only for the edges between two different qubits of qubits. If
+                          None, they are created for every ordered pair of different qubits.
         """
+        # each build replaces the channels of the previous one, so edges and qubits left out of
+        # this coupling map keep no stale channels
+        self.one_qubit_gates_relaxation_dephasing_noise_channel = []
+        self.two_qubits_gates_relaxation_dephasing_noise_channel = {}
 
-        # For each qubit, we add it respective one_qubit and two_qubit gates noise
+        # For each qubit, we add it respective one_qubit gates noise
         for qubit in qubits:
             # Here, we add the one_qubit gates noise
             self.one_qubit_gates_relaxation_dephasing_noise_channel.append([])
             for gate in range(len(one_qubit_gates)):
-                error = thermal_relaxation_error(
+                error = self.channel_cache.thermal_relaxation_error(
                     qubits_T1[qubit],
                     qubits_T2[qubit],
                     one_qubit_gates_times[qubit][gate],
                 )
                 self.one_qubit_gates_relaxation_dephasing_noise_channel[qubit].append(error)
 
-            # Here, we add the two_qubit gates noise
-            self.two_qubits_gates_relaxation_dephasing_noise_channel.append([])
-            for second_qubit in qubits:
-                self.two_qubits_gates_relaxation_dephasing_noise_channel[qubit].append([])
-                for gate in range(len(two_qubits_gates)):
-                    error = thermal_relaxation_error(
+        # Here, we add the two_qubit gates noise, only over the edges of the coupling map
+        if coupling_map is None:
+            edges = [(qubit, second_qubit) for qubit in qubits for second_qubit in qubits
+                     if qubit != second_qubit]
+        else:
+            if hasattr(coupling_map, 'get_edges'):
+                coupling_map = coupling_map.get_edges()
+            # a device wide map, like get_coupling_map(), can have edges beyond the given qubits
+            qubits_set = set(qubits)
+            edges = [
+                (int(edge[0]), int(edge[1])) for edge in coupling_map
+                if edge[0] != edge[1] and edge[0] in qubits_set and edge[1] in qubits_set
+            ]
+
+        for qubit, second_qubit in edges:
+            self.two_qubits_gates_relaxation_dephasing_noise_channel[(qubit, second_qubit)] = []
+            for gate in range(len(two_qubits_gates)):
+                error = self.channel_cache.expand(
+                    self.channel_cache.thermal_relaxation_error(
                         qubits_T1[qubit],
                         qubits_T2[qubit],
                         two_qubits_gates_times[gate],
-                    ).expand(
-                        thermal_relaxation_error(
-                            qubits_T1[second_qubit],
-                            qubits_T2[second_qubit],
-                            two_qubits_gates_times[gate],
-                        ),
+                    ),
+                    self.channel_cache.thermal_relaxation_error(
+                        qubits_T1[second_qubit],
+                        qubits_T2[second_qubit],
+                        two_qubits_gates_times[gate],
+                    ),
+                )
+                self.two_qubits_gates_relaxation_dephasing_noise_channel[
+                    (qubit, second_qubit)
+                ].append(error)
+
+
+    
+
+    #-------------NOISE MODEL ERRORS------------------------
+
+    @profiled
+    def _addQuantumError(self, error, instructions, qubits, warnings=True):
+        '''Adds a quantum error to the noise model and saves it in self.quantum_errors.'''
+        if error.ideal():
+            return
+        self.noise_model.add_quantum_error(error, instructions, qubits, warnings=warnings)
+        if isinstance(instructions, str):
+            instructions = [instructions]
+        for instruction in instructions:
+            self.quantum_errors.setdefault((instruction, tuple(qubits)), []).append(error)
+
+    def _addQuantumErrors(self, errors, warnings=True):
+        '''Adds the errors of a dict like self.quantum_errors to the noise model and saves them in
+        self.quantum_errors.'''
+        for (instruction, qubits), key_errors in errors.items():
+            for error in key_errors:
+                self._addQuantumError(error, instruction, list(qubits), warnings=warnings)
+
+    @staticmethod
+    def _setError(errors, error, instructions, qubits):
+        '''Saves an error over some instructions and qubits in a dict like self.quantum_errors,
+        unless it is ideal.'''
+        if error.ideal():
+            return
+        if isinstance(instructions, str):
+            instructions = [instructions]
+        for instruction in instructions:
+            errors.setdefault((instruction, tuple(qubits)), []).append(error)
+
+    def _addReadoutError(self, error, qubit):
+        '''Adds a classical readout error to the noise model and saves it in self.readout_errors.'''
+        if error.ideal():
+            return
+        self.noise_model.add_readout_error(error, [qubit], warnings=False)
+        self.readout_errors[qubit] = error
+
+    @staticmethod
+    def _addReadoutErrors(noise_model, readout_errors):
+        '''Adds the readout errors of a dict like self.readout_errors to another noise model.'''
+        for qubit, error in readout_errors.items():
+            noise_model.add_readout_error(error, [qubit], warnings=False)
+
+    @profiled
+    def _addAllQubitQuantumError(self, error, instructions, warnings=True):
+        '''Adds an all-qubit quantum error to the noise model and saves it in
+        self.quantum_errors.'''
+        if error.ideal():
+            return
+        self.noise_model.add_all_qubit_quantum_error(error, instructions, warnings=warnings)
+        if isinstance(instructions, str):
+            instructions = [instructions]
+        for instruction in instructions:
+            self.quantum_errors.setdefault((instruction, None), []).append(error)
+
+    def _getMinimalError(self, channel):
+        '''Returns a channel as a pauli error if it is a Pauli channel, or as a minimal Kraus error
+        otherwise.'''
+        noise_ops = self._getPauliTwirl(channel, 0)
+        if np.allclose(SuperOp(pauli_error(noise_ops).to_quantumchannel()).data, channel.data,
+                       atol=1e-12):
+            return self.channel_cache.pauli_error(noise_ops)
+        return QuantumError(Kraus(channel))
+
+    def _getFusedError(self, errors):
+        '''Returns the SuperOp of the composition, in order, of a list of errors.'''
+        channel = self.channel_cache.superop(errors[0])
+        for error in errors[1:]:
+            channel = channel.compose(self.channel_cache.superop(error))
+        return channel
+
+    @profiled
+    def finalize(self):
+        '''Replaces the noise model by an equivalent one with a single error for each instruction
+        and qubits, fusing all the errors added to them into one channel in its minimal form: a
+        Pauli error if it is a Pauli channel, or a minimal Kraus channel otherwise. The simulator
+        then applies one channel on each gate, and the model is smaller when serialized.'''
+        self.noise_model, self.quantum_errors = self._getFusedNoiseModel()
+
+    @profiled
+    def _getFusedNoiseModel(self):
+        '''Returns a noise model equivalent to self.noise_model, with a single channel in its
+        minimal form for each instruction and qubits, and its errors as a dict like
+        self.quantum_errors.'''
+        noise_model = NoiseModel(basis_gates=self.noise_model.basis_gates)
+        quantum_errors = {}
+        # keys with the same errors share their fused error
+        fused_errors = {}
+        for (instruction, qubits), errors in self.quantum_errors.items():
+            errors_key = tuple(id(error) for error in errors)
+            if errors_key not in fused_errors:
+                fused_errors[errors_key] = self._getMinimalError(self._getFusedError(errors))
+            error = fused_errors[errors_key]
+            if qubits is None:
+                noise_model.add_all_qubit_quantum_error(error, instruction, warnings=False)
+            else:
+                noise_model.add_quantum_error(error, instruction, qubits, warnings=False)
+            quantum_errors[(instruction, qubits)] = [error]
+        self._addReadoutErrors(noise_model, self.readout_errors)
+
+        return noise_model, quantum_errors
+
+    #-------------PAULI APPROXIMATION------------------------
+
+    def get_pauli_noise_model(self, threshold=1e-12):
+        '''Returns a pure Pauli approximation of the noise model, which can be run with the
+        stabilizer and extended stabilizer methods of the simulator on the whole device.
+
+        The errors of each instruction and qubits (depolarizing, SPAM, relaxation and dephasing) are
+        fused and Pauli twirled: the Pauli channel keeps the diagonal of the chi matrix of the fused
+        channel, so it is exact for the depolarizing and SPAM channels and approximates the
+        relaxation and dephasing ones.
+
+        Args:
+            threshold(float): Pauli terms with smaller probabilities are dropped, and their
+                              probability is added to the identity term.
+
+        Returns:
+            tuple: the Pauli noise model and the approximation errors, as
+            dict[(instruction, qubits)] = 1 - process fidelity between the truncated Pauli channel
+            and the exact channel.
+        '''
+        noise_model = NoiseModel(basis_gates=self.noise_model.basis_gates)
+        approximation_errors = {}
+        # keys with the same errors share their Pauli channel
+        pauli_channels = {}
+        for (instruction, qubits), errors in self.quantum_errors.items():
+            errors_key = tuple(id(error) for error in errors)
+            if errors_key not in pauli_channels:
+                channel = self._getFusedError(errors)
+                error = self.channel_cache.pauli_error(self._getPauliTwirl(channel, threshold))
+                pauli_channels[errors_key] = (
+                    error, 1 - process_fidelity(self.channel_cache.superop(error), channel),
+                )
+            error, approximation_errors[(instruction, qubits)] = pauli_channels[errors_key]
+
+            if qubits is None:
+                noise_model.add_all_qubit_quantum_error(error, instruction, warnings=False)
+            else:
+                noise_model.add_quantum_error(error, instruction, qubits, warnings=False)
+        # the classical readout errors need no approximation
+        self._addReadoutErrors(noise_model, self.readout_errors)
+
+        return noise_model, approximation_errors
+
+    def _getPauliTwirl(self, channel, threshold):
+        '''Returns the Pauli twirl of a channel as the noise_ops of a pauli_error, [(label, prob)].
+        The probabilities are the diagonal of its chi matrix, sum_k |Tr(P K_k)|**2 / 4**n for its
+        Kraus operators K_k. The terms with probabilities below the threshold are dropped and their
+        probability is added to the identity.'''
+        num_qubits = channel.num_qubits
+        paulis = pauli_basis(num_qubits)
+        kraus_operators = np.array(Kraus(channel).data)
+        coefficients = np.einsum(
+            'pij,kij->kp', paulis.to_matrix(array=True).conj(), kraus_operators,
+        ) / 2**num_qubits
+        probabilities = (np.abs(coefficients)**2).sum(axis=0)
+        probabilities /= probabilities.sum()
+
+        # the probability of the dropped terms is given to the identity, the first Pauli of the
+        # basis, so the channel stays normalized
+        kept = probabilities > threshold
+        kept[0] = True
+        probabilities[0] += probabilities[~kept].sum()
+
+        return [
+            (label, probability)
+            for label, probability, keep in zip(paulis.to_labels(), probabilities.tolist(), kept)
+            if keep
+        ]
+
+    #-------------TRANSPILATION------------------------
+
+    def transpile(self, circuits, optimization_level=1, basis_gates=None, coupling_map=None,
+                  **transpile_options):
+        '''Transpiles circuits for the model through its transpile cache, so repeated experiments
+        and sweeps over the same circuit skip the transpilation after the first time.
+
+        Args:
+            circuits(QuantumCircuit or list[QuantumCircuit]): circuits to transpile.
+            optimization_level(int): optimization level of transpile.
+            basis_gates(list[str]): if None, the single qubit basis gates and the noisy two qubits
+                                    gates of the calibration data (cx instead of ecr), or the basis
+                                    gates of the noise model if there is no calibration data.
+            coupling_map(list): if None, the coupling map of the calibration data, if any.
+            transpile_options: other options for transpile, like initial_layout.
+
+        Returns:
+            QuantumCircuit or list[QuantumCircuit]: the transpiled circuits.
+        '''
+        if basis_gates is None:
+            if self.single_qubit_basis_gates is not None:
+                basis_gates = self.single_qubit_basis_gates + self.get_noisy_two_qubits_gates()
+            else:
+                basis_gates = self.noise_model.basis_gates
+        if coupling_map is None and self.edges is not None:
+            coupling_map = self.get_coupling_map()
+
+        if isinstance(circuits, QuantumCircuit):
+            return self.transpile_cache.transpile(
+                circuits, basis_gates, coupling_map, optimization_level, **transpile_options,
+            )
+        return [
+            self.transpile_cache.transpile(
+                circuit, basis_gates, coupling_map, optimization_level, **transpile_options,
+            )
+            for circuit in circuits
+        ]
+
+    #-------------RESTRICTION TO THE ACTIVE QUBITS------------------------
+
+    def restrict_to_qubits(self, qubits):
+        '''Returns a noise model with only the errors over some physical qubits and the edges
+        between them, remapped to the qubits 0, 1, ..., in the order of the sorted physical qubits.
+        The all-qubit errors and the readout errors of the qubits are kept.
+
+        Args:
+            qubits(list[int] or Layout): physical qubits, or a layout whose physical qubits are
+                                         used.
+        '''
+        if hasattr(qubits, 'get_physical_bits'):
+            qubits = qubits.get_physical_bits()
+        qubits_index = {qubit: i for i, qubit in enumerate(sorted(qubits))}
+
+        errors = {}
+        for (instruction, key_qubits), key_errors in self.quantum_errors.items():
+            if key_qubits is None:
+                errors[(instruction, None)] = key_errors
+            elif all(qubit in qubits_index for qubit in key_qubits):
+                key_qubits = tuple(qubits_index[qubit] for qubit in key_qubits)
+                errors[(instruction, key_qubits)] = key_errors
+
+        readout_errors = {
+            qubits_index[qubit]: error
+            for qubit, error in self.readout_errors.items() if qubit in qubits_index
+        }
+        return self._getNoiseModel([errors], readout_errors)
+
+    def restrict_to_circuit(self, circuit):
+        '''Returns a compact noise model and circuit over only the qubits used by a transpiled
+        circuit, so the simulation scales with the circuit width instead of the device width.
+
+        Returns:
+            tuple: the noise model (see restrict_to_qubits), the circuit remapped to the qubits 0,
+            1, ... and the list of physical qubits, where the physical qubit qubits[i] is the
+            qubit i.
+        '''
+        qubits = self._getUsedQubits(circuit)
+        return self.restrict_to_qubits(qubits), self._getRestrictedCircuit(circuit, qubits), qubits
+
+    def _getRestrictedCircuit(self, circuit, qubits):
+        '''Returns a circuit remapped to the qubits 0, 1, ..., where the qubit qubits[i] of the
+        circuit is the qubit i, without the instructions over other qubits.'''
+        qubits_index = {qubit: i for i, qubit in enumerate(qubits)}
+
+        restricted_circuit = QuantumCircuit(
+            QuantumRegister(len(qubits), 'q'), *circuit.cregs, name=circuit.name,
+            global_phase=circuit.global_phase, metadata=circuit.metadata,
+        )
+        for instruction in circuit.data:
+            instruction_qubits = [
+                qubits_index[circuit.find_bit(qubit).index] for qubit in instruction.qubits
+                if circuit.find_bit(qubit).index in qubits_index
+            ]
+            # the barriers are kept over their used qubits
+            if len(instruction_qubits) != len(instruction.qubits):
+                if not instruction_qubits:
+                    continue
+                operation = instruction.operation.__class__(len(instruction_qubits))
+            else:
+                operation = instruction.operation
+            restricted_circuit.append(
+                operation,
+                instruction_qubits,
+                [circuit.find_bit(clbit).index for clbit in instruction.clbits],
+            )
+
+        return restricted_circuit
+
+    def _getUsedQubits(self, circuit):
+        '''Returns the sorted indexes of the qubits of a circuit with some instruction other than a
+        barrier.'''
+        return sorted({
+            circuit.find_bit(qubit).index
+            for instruction in circuit.data if instruction.operation.name != 'barrier'
+            for qubit in instruction.qubits
+        })
+
+    #-------------SWEEPS------------------------
+
+    @profiled
+    def sweep(self, circuit, success_states, grid, shots=10000, max_workers=1, seed=None,
+              **transpile_options):
+        '''Runs a circuit over a grid of scale factors of the calibration noise channels and returns
+        its success probability at each point.
+
+        The circuit is transpiled once, through the transpile cache. The channels of each stage are
+        built once for each of its scale factors and reused by all the grid points, so only the
+        affected channels change between points. The simulations of the points are run concurrently
+        by max_workers threads, as the simulator releases the GIL.
+
+        Args:
+            circuit(QuantumCircuit): circuit to run, with its measurements.
+            success_states(list[str]): bitstrings, as in the counts, of the successful outcomes.
+            grid(dict[str, list[float]]): scale factors of each swept stage: 'depolarizing' scales
+                                          the single and two qubits error rates, 'spam' the
+                                          measurement error rates and 't1t2' divides the T1s and
+                                          T2s, so larger factors are more noise. The stages not in
+                                          the grid keep the calibration values. If the model has
+                                          classical readout errors, 'spam' scales them instead of a
+                                          SPAM channel.
+            shots(int): shots of each grid point.
+            max_workers(int): threads which run the simulations.
+            seed(int): seed of the simulator, the same for all the points.
+            transpile_options: options for transpile (see the transpile method), like
+                               initial_layout or optimization_level.
+
+        Returns:
+            ndarray: float[len(grid[stage]) for each stage of grid] with the success probabilities.
+        '''
+        unknown_stages = set(grid) - set(SWEEP_STAGES)
+        if unknown_stages:
+            raise ValueError('Unknown sweep stages: ' + str(sorted(unknown_stages)))
+
+        transpiled_circuit = self.transpile(circuit, **transpile_options)
+
+        # only the channels over the qubits used by the circuit are built
+        used_qubits = set(self._getUsedQubits(transpiled_circuit))
+        axes = [list(grid.get(stage, [1])) for stage in SWEEP_STAGES]
+        stages_errors = [
+            [self._getStageErrors(stage, scale, used_qubits) for scale in scales]
+            for stage, scales in zip(SWEEP_STAGES, axes)
+        ]
+
+        # the noise models are assembled here and not in the threads, as the channel cache is not
+        # thread safe
+        noise_models = []
+        for indexes in itertools.product(*[range(len(scales)) for scales in axes]):
+            point_errors = [stage_errors[i] for stage_errors, i in zip(stages_errors, indexes)]
+            noise_models.append(self._getNoiseModel(
+                [quantum_errors for quantum_errors, _ in point_errors],
+                {
+                    qubit: error
+                    for _, readout_errors in point_errors for qubit, error in readout_errors.items()
+                },
+            ))
+
+        def run_point(noise_model):
+            simulator = AerSimulator(noise_model=noise_model)
+            result = simulator.run(transpiled_circuit, shots=shots, seed_simulator=seed).result()
+            counts = result.get_counts()
+            return sum(counts.get(state, 0) for state in success_states) / shots
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            success_probabilities = np.array(list(executor.map(run_point, noise_models)))
+
+        shape = [len(grid[stage]) for stage in SWEEP_STAGES if stage in grid]
+        return success_probabilities.reshape(shape)
+
+    def _getStageErrors(self, stage, scale, qubits):
+        '''Returns the errors of a noise stage over some qubits, and the edges between them, with
+        its calibration data scaled, as a dict like self.quantum_errors and a dict like
+        self.readout_errors. The model is not modified.'''
+        qubits_mask = np.isin(self.qubits, list(qubits))
+        edges_mask = (
+            np.isin(self.edges['src'], list(qubits)) & np.isin(self.edges['dst'], list(qubits))
+        )
+        stage_qubits = np.array(self.qubits)[qubits_mask].tolist()
+        edges = self.edges[edges_mask]
+
+        if stage == 'depolarizing':
+            edges['error'] = np.minimum(edges['error'] * scale, 1)
+            return self._getDepolarizingErrors(
+                stage_qubits,
+                np.minimum(self.single_qubit_error_rates[qubits_mask] * scale, 1),
+                edges,
+            ), {}
+        if stage == 'spam':
+            measurement_error_rates = np.minimum(
+                self.measurement_error_rates[qubits_mask] * scale, 1,
+            )
+            if self.classical_readout:
+                return {}, self._getReadoutErrors(stage_qubits, measurement_error_rates)
+            return self._getSpamErrors(stage_qubits, measurement_error_rates), {}
+        return self._getRelaxationDephasingErrors(
+            stage_qubits,
+            self.T1s[qubits_mask] / scale,
+            self.T2s[qubits_mask] / scale,
+            self.single_qubit_gates_times[qubits_mask],
+            None if self.readout_lengths is None else self.readout_lengths[qubits_mask],
+            edges,
+            self.two_qubits_gates_times[edges_mask],
+        ), {}
+
+    def _getNoiseModel(self, stages_errors, readout_errors=None):
+        '''Returns a noise model with the errors of several dicts like self.quantum_errors, adding a
+        single error, composed in order through the channel cache, for each instruction and qubits,
+        and the readout errors of a dict like self.readout_errors, if given.'''
+        errors = {}
+        for stage_errors in stages_errors:
+            for key, stage_error in stage_errors.items():
+                errors.setdefault(key, []).extend(stage_error)
+
+        noise_model = NoiseModel(basis_gates=self.noise_model.basis_gates)
+        for (instruction, qubits), key_errors in errors.items():
+            error = key_errors[0]
+            for other in key_errors[1:]:
+                error = self.channel_cache.compose(error, other)
+            if qubits is None:
+                noise_model.add_all_qubit_quantum_error(error, instruction, warnings=False)
+            else:
+                noise_model.add_quantum_error(error, instruction, qubits, warnings=False)
+        if readout_errors is not None:
+            self._addReadoutErrors(noise_model, readout_errors)
+
+        return noise_model
+
+    #-------------EXACT SIMULATION------------------------
+
+    @profiled
+    def exact_probabilities(self, circuits, shots=None, seed=None):
+        '''Returns the exact outcome probabilities of circuits whose measurements are all at the
+        end, computed with the density matrix method and the channels of the noise model, instead of
+        sampling them.
+
+        Each circuit is simulated over only its used qubits, with the noise model restricted to
+        them (see restrict_to_circuit), so the density matrix scales with the circuit width instead
+        of the device width. The circuits with the same used qubits are run together. The final
+        measurements are replaced by the errors of the noise model on the measure instruction, and
+        the classical readout errors are applied to the probabilities, so the readout noise is
+        included too.
+
+        Args:
+            circuits(QuantumCircuit or list[QuantumCircuit]): transpiled circuits with the same
+                                                              number of classical bits.
+            shots(int): if given, the probabilities are resampled with a multinomial distribution
+                        to emulate this number of shots, and counts are returned.
+            seed(int): seed of the resampling.
+
+        Returns:
+            ndarray: float[circuits][2**num_clbits] with the probabilities of each circuit, indexed
+            by the integer value of the bitstrings, or int[circuits][2**num_clbits] with the
+            resampled counts if shots is given.
+
+        Raises:
+            ValueError: if a circuit measures a qubit before its last operation.
+        '''
+        if not isinstance(circuits, (list, tuple)):
+            circuits = [circuits]
+        num_clbits = circuits[0].num_clbits
+        if any(circuit.num_clbits != num_clbits for circuit in circuits):
+            raise ValueError('All the circuits must have the same number of classical bits.')
+
+        # the circuits over the same physical qubits share a restricted noise model and a run
+        groups = {}
+        measured_clbits = []
+        measured_qubits = []
+        for i, circuit in enumerate(circuits):
+            used_qubits = tuple(self._getUsedQubits(circuit))
+            if used_qubits not in groups:
+                groups[used_qubits] = (self.restrict_to_qubits(used_qubits), [], [])
+            exact_circuit, clbits, qubits = self._getExactCircuit(
+                self._getRestrictedCircuit(circuit, used_qubits), used_qubits,
+            )
+            groups[used_qubits][1].append(i)
+            groups[used_qubits][2].append(exact_circuit)
+            measured_clbits.append(clbits)
+            measured_qubits.append(qubits)
+
+        saved = [None] * len(circuits)
+        for noise_model, indexes, exact_circuits in groups.values():
+            simulator = AerSimulator(method='density_matrix', noise_model=noise_model)
+            result = simulator.run(exact_circuits, shots=1).result()
+            for j, i in enumerate(indexes):
+                saved[i] = result.data(j)['probabilities']
+
+        probabilities = np.zeros((len(circuits), 2**num_clbits))
+        for i, (clbits, qubits) in enumerate(zip(measured_clbits, measured_qubits)):
+            saved_probabilities = saved[i]
+            measured_probabilities = np.zeros(2**len(clbits))
+            measured_probabilities[list(saved_probabilities.keys())] = list(
+                saved_probabilities.values(),
+            )
+            if self.readout_errors:
+                measured_probabilities = apply_readout_errors(
+                    measured_probabilities, self.get_readout_assignment_matrices(qubits),
+                )
+
+            # index of each outcome of the measured clbits in the full bitstrings
+            outcomes = np.arange(2**len(clbits))
+            indexes = np.zeros(len(outcomes), dtype=np.int64)
+            for position, clbit in enumerate(clbits):
+                indexes |= ((outcomes >> position) & 1) << clbit
+            probabilities[i, indexes] = measured_probabilities
+
+        if shots is None:
+            return probabilities
+
+        # the density matrix simulation can give tiny negative probabilities
+        probabilities = np.clip(probabilities, 0, None)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        return np.random.default_rng(seed).multinomial(shots, probabilities)
+
+    def _getExactCircuit(self, circuit, physical_qubits=None):
+        '''Returns a copy of the circuit where the final measurements are replaced by the measure
+        errors of their qubits and a save_probabilities_dict instruction, the measured clbits in the
+        order of the saved probabilities and their physical qubits. physical_qubits gives the
+        physical qubit of each qubit of a restricted circuit, if it is one.'''
+        exact_circuit = circuit.copy_empty_like()
+        clbits_qubits = {}
+        measured_qubits = set()
+        for instruction in circuit.data:
+            qubits = [circuit.find_bit(qubit).index for qubit in instruction.qubits]
+            if instruction.operation.name == 'measure':
+                clbits_qubits[circuit.find_bit(instruction.clbits[0]).index] = qubits[0]
+                measured_qubits.add(qubits[0])
+            elif instruction.operation.name != 'barrier':
+                if measured_qubits.intersection(qubits):
+                    raise ValueError(
+                        'Only circuits with all the measurements at the end are supported.',
                     )
-                    self.two_qubits_gates_relaxation_dephasing_noise_channel[qubit][
-                        second_qubit
-                    ].append(error)
+                exact_circuit.append(instruction)
+
+        clbits = sorted(clbits_qubits)
+        qubits = [clbits_qubits[clbit] for clbit in clbits]
+        if physical_qubits is None:
+            physical_qubits = range(circuit.num_qubits)
+        for qubit in qubits:
+            errors = self.quantum_errors.get(('measure', (physical_qubits[qubit],)),
+                                             self.quantum_errors.get(('measure', None)))
+            if errors:
+                exact_circuit.append(QuantumError(Kraus(self._getFusedError(errors))), [qubit])
+        exact_circuit.save_probabilities_dict(qubits, label='probabilities')
+
+        return exact_circuit, clbits, [physical_qubits[qubit] for qubit in qubits]
+
+    #-------------PROFILING------------------------
+
+    @contextmanager
+    def _profileStage(self, stage):
+        '''Context manager that records the calls and time of a construction stage.'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self.stage_timings.setdefault(stage, {'calls': 0, 'time': 0.0})
+            timing['calls'] += 1
+            timing['time'] += time.perf_counter() - start
+
+    @contextmanager
+    def profile_run(self, label='run'):
+        '''Context manager that records the wall time and the max resident set size of the process
+        of the code it wraps, like a simulator run, in the run timings of the profile report. The
+        max resident set size is None where it can not be measured, like on Windows.
+
+            with unm.profile_run('zne'):
+                result = simulator.run(circuits, shots=shots).result()
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.run_timings.append({
+                'label': label,
+                'wall_time': time.perf_counter() - start,
+                'max_rss_mb': get_max_rss_mb(),
+            })
+
+    def profile_report(self, pickled_size=False):
+        '''Returns a Profile_Report with the stage timings, the channels created and deduplicated,
+        the entries of the noise model and its memory estimates.
+
+        Args:
+            pickled_size(bool): if True, the noise model is pickled to measure its size, which can
+                                take some seconds for large devices.
+        '''
+        errors = [error for key_errors in self.quantum_errors.values() for error in key_errors]
+        channels = {'registered': len(errors), 'distinct': len({id(error) for error in errors})}
+
+        noise_model_entries = {}
+        for instruction, qubits in self.quantum_errors:
+            entries = noise_model_entries.setdefault(instruction, {'local': 0, 'all_qubit': 0})
+            entries['local' if qubits is not None else 'all_qubit'] += 1
+        if self.readout_errors:
+            noise_model_entries['readout'] = {'local': len(self.readout_errors), 'all_qubit': 0}
+
+        # a fused channel over n qubits is a 4**n x 4**n complex superoperator
+        memory = {'fused_superoperators': sum(
+            16 * 16**key_errors[0].num_qubits for key_errors in self.quantum_errors.values()
+        )}
+        if pickled_size:
+            memory['pickled_noise_model'] = len(pickle.dumps(self.noise_model))
+
+        return Profile_Report(
+            {stage: dict(timing) for stage, timing in self.stage_timings.items()},
+            list(self.run_timings),
+            channels,
+            self.channel_cache.stats(),
+            noise_model_entries,
+            memory,
+        )
+
+    #-------------SNAPSHOTS------------------------
+
+    @profiled
+    def save_snapshot(self, path):
+        '''Saves the model as a pickle file: the calibration arrays, the channels and the assembled
+        noise model, together with the hash of the calibration csv file. The noise model is saved as
+        a minimal Kraus channel for each instruction and qubits, that are fast to load. The device
+        to simulate, the caches and the profiling data are not saved.'''
+        state = dict(self.__dict__)
+        del state['device_to_simulate']
+        del state['channel_cache']
+        del state['transpile_cache']
+        del state['noise_model']
+        del state['quantum_errors']
+        del state['stage_timings']
+        del state['run_timings']
+
+        # the noise model is saved with one minimal Kraus channel for each instruction and qubits
+        noise_model, quantum_errors = self._getFusedNoiseModel()
+
+        snapshot = {
+            'version': SNAPSHOT_VERSION,
+            'calibration_hash': self.calibration_hash,
+            'state': state,
+            'noise_model': noise_model,
+            'quantum_errors': quantum_errors,
+        }
+        with open(path, 'wb') as file:
+            pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load_snapshot(cls, path, channel_cache=None):
+        '''Returns the model saved in path by save_snapshot.
+
+        Raises:
+            ValueError: if the file was written with another version of the snapshot format.
+        '''
+        with open(path, 'rb') as file:
+            snapshot = pickle.load(file)
+        if snapshot.get('version') != SNAPSHOT_VERSION:
+            raise ValueError('Unsupported snapshot version: ' + str(snapshot.get('version')))
+
+        model = cls(channel_cache)
+        model.__dict__.update(snapshot['state'])
+        model.noise_model = snapshot['noise_model']
+        model.quantum_errors = snapshot['quantum_errors']
+        return model
+
+    @classmethod
+    def from_calibration(cls, path, single_qubit_basis_gates, two_qubits_basis_gates,
+                         device_to_simulate=None, properties=None, snapshot_path=None,
+                         classical_readout=False):
+        '''Returns a model with the calibration data of path and all its noise channels
+        (add_calibration_data + add_all_noise_channels2(classical_readout)).
+
+        If snapshot_path is given, the model is loaded from it when it was built from the same
+        calibration file, basis gates, backend properties and readout mode. Otherwise, the model is
+        built and saved in snapshot_path, so later runs and worker processes skip the channels
+        construction.'''
+        properties = cls._loadProperties(properties, device_to_simulate)
+        model = cls._loadValidSnapshot(
+            snapshot_path, cls._getFileHash(path), single_qubit_basis_gates,
+            two_qubits_basis_gates, properties, classical_readout,
+        )
+        if model is not None:
+            model.device_to_simulate = device_to_simulate
+            return model
+
+        model = cls()
+        model.add_calibration_data(
+            path,
+            list(single_qubit_basis_gates),
+            list(two_qubits_basis_gates),
+            device_to_simulate,
+            properties,
+        )
+        model.add_all_noise_channels2(classical_readout)
+        if snapshot_path is not None:
+            model.save_snapshot(snapshot_path)
+        return model
+
+    @classmethod
+    def from_arrays(cls, qubits, single_qubit_basis_gates, two_qubits_basis_gates,
+                    single_qubit_error_rates, measurement_error_rates, T1s, T2s, edges,
+                    readout_lengths=None, properties=None, calibration_hash=None,
+                    snapshot_path=None, classical_readout=False):
+        '''Returns a model with calibration data already parsed into arrays and all its noise
+        channels (add_calibration_arrays + add_all_noise_channels2(classical_readout)).
+
+        If snapshot_path and the calibration_hash of the file of the arrays are given, the snapshots
+        are reused and saved as in from_calibration.'''
+        properties = cls._loadProperties(properties, None)
+        if calibration_hash is not None:
+            model = cls._loadValidSnapshot(
+                snapshot_path, calibration_hash, single_qubit_basis_gates,
+                two_qubits_basis_gates, properties, classical_readout,
+            )
+            if model is not None:
+                return model
+
+        model = cls()
+        model.add_calibration_arrays(
+            qubits,
+            list(single_qubit_basis_gates),
+            list(two_qubits_basis_gates),
+            single_qubit_error_rates,
+            measurement_error_rates,
+            T1s,
+            T2s,
+            edges,
+            readout_lengths,
+            properties,
+            calibration_hash,
+        )
+        model.add_all_noise_channels2(classical_readout)
+        if snapshot_path is not None and calibration_hash is not None:
+            model.save_snapshot(snapshot_path)
+        return model
+
+    @classmethod
+    def _loadValidSnapshot(cls, snapshot_path, calibration_hash, single_qubit_basis_gates,
+                           two_qubits_basis_gates, properties, classical_readout):
+        '''Returns the model saved in snapshot_path if it was built from the same calibration file,
+        basis gates, backend properties and readout mode, or None.'''
+        if snapshot_path is None or not os.path.exists(snapshot_path):
+            return None
 
+        model = cls.load_snapshot(snapshot_path)
+        if (model.calibration_hash == calibration_hash
+                and model.single_qubit_basis_gates == list(single_qubit_basis_gates)
+                and model.two_qubits_basis_gates == list(two_qubits_basis_gates)
+                and model.properties_hash == cls._getPropertiesHash(properties)
+                and model.classical_readout == classical_readout):
+            return model
+        return None
 
-    
\ No newline at end of file
+    @staticmethod
+    def _getFileHash(path):
+        '''Returns the sha256 hash of the content of a file.'''
+        with open(path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
@@ -0,0 +1,172 @@
+import time
+import tracemalloc
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.circuit.library import get_standard_gate_name_mapping
+from qiskit_aer import AerSimulator
+
+try:
+    from .Unified_Noise_Model import Unified_Noise_Model
+    from .executors import run_counts
+    from .metrics import hellinger_distance
+    from .profiling import get_max_rss_mb
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from Unified_Noise_Model import Unified_Noise_Model
+    from executors import run_counts
+    from metrics import hellinger_distance
+    from profiling import get_max_rss_mb
+
+
+def get_connected_qubits(coupling_map, width, rng):
+    '''Returns a random set of width connected qubits of a coupling map, grown from a random
+    qubit.'''
+    neighbors = {}
+    for qubit, second_qubit in coupling_map:
+        neighbors.setdefault(qubit, set()).add(second_qubit)
+        neighbors.setdefault(second_qubit, set()).add(qubit)
+
+    qubits = [int(rng.choice(sorted(neighbors)))]
+    frontier = set(neighbors[qubits[0]])
+    while len(qubits) < width:
+        if not frontier:
+            raise ValueError('The coupling map has no ' + str(width) + ' connected qubits.')
+        qubit = int(rng.choice(sorted(frontier)))
+        qubits.append(qubit)
+        frontier = (frontier | neighbors[qubit]) - set(qubits)
+
+    return qubits
+
+
+def random_circuit(coupling_map, single_qubit_gates, two_qubits_gates, width, depth, seed=None):
+    '''Returns a random circuit over width connected physical qubits of a coupling map, with depth
+    layers of basis gates and the measurement of the qubits.
+
+    In each layer, a random subset of disjoint edges between the qubits get a random two qubits gate
+    and the other qubits a random single qubit gate, with random angles for the parametric gates.
+    '''
+    rng = np.random.default_rng(seed)
+    gates = get_standard_gate_name_mapping()
+    qubits = get_connected_qubits(coupling_map, width, rng)
+    edges = [
+        (qubit, second_qubit) for qubit, second_qubit in coupling_map
+        if qubit in qubits and second_qubit in qubits
+    ]
+
+    def random_gate(name):
+        gate = gates[name]
+        if gate.params:
+            gate = gate.base_class(*rng.uniform(0, 2 * np.pi, len(gate.params)))
+        return gate
+
+    circuit = QuantumCircuit(max(qubits) + 1, width)
+    for _ in range(depth):
+        free_qubits = set(qubits)
+        for edge in rng.permutation(len(edges)):
+            qubit, second_qubit = edges[edge]
+            if qubit in free_qubits and second_qubit in free_qubits and rng.random() < 0.5:
+                circuit.append(random_gate(rng.choice(two_qubits_gates)), [qubit, second_qubit])
+                free_qubits -= {qubit, second_qubit}
+        for qubit in sorted(free_qubits):
+            circuit.append(random_gate(rng.choice(single_qubit_gates)), [qubit])
+
+    circuit.measure(qubits, range(width))
+    return circuit
+
+
+def run_benchmark(
+    calibration_path,
+    single_qubit_basis_gates,
+    two_qubits_basis_gates,
+    properties,
+    depths,
+    width=3,
+    n_circuits=100,
+    shots=10000,
+    seed=None,
+    references=None,
+    store=None,
+):
+    '''Runs a random circuit validation of the model built from a calibration csv file.
+
+    For each depth, n_circuits seeded random circuits are simulated under the model and compared
+    with reference distributions, so changes to the model can be checked for fidelity and
+    performance. Each circuit is simulated over only its qubits, with the model restricted to them
+    (see restrict_to_circuit), so the wall time and memory are the ones of the circuits and not of
+    the device width.
+
+    Args:
+        calibration_path(str): calibration csv file.
+        single_qubit_basis_gates(list[str]): single qubit basis gates, as in add_calibration_data.
+        two_qubits_basis_gates(list[str]): two qubits basis gates, as in add_calibration_data.
+        properties: device properties with the gates times, as in add_calibration_data.
+        depths(list[int]): depths of the random circuits.
+        width(int): qubits of the random circuits.
+        n_circuits(int): random circuits of each depth.
+        shots(int): shots of each circuit.
+        seed(int): seed of the random circuits. The circuit i of depth d uses the seed [seed, d, i].
+        references(dict): int[n_circuits][2**width] reference count (or probability) arrays of each
+                          depth, like the hardware results or np.load(path, mmap_mode='r'). If None,
+                          the circuits are compared with their ideal simulation.
+        store(Results_Store): if given, the report of each depth is appended to it.
+
+    Returns:
+        list[dict]: report of each depth, with the mean and standard deviation of the Hellinger
+        distances, the simulation wall time (without the restriction of the model), the peak
+        python memory and the max resident set size of the process (both in MB, the last one None
+        on Windows), and the model build time.
+    '''
+    start = time.perf_counter()
+    unm = Unified_Noise_Model.from_calibration(
+        calibration_path, single_qubit_basis_gates, two_qubits_basis_gates, properties=properties,
+    )
+    build_time = time.perf_counter() - start
+
+    coupling_map = unm.get_coupling_map()
+    two_qubits_gates = unm.get_noisy_two_qubits_gates()
+    ideal_simulator = AerSimulator()
+
+    reports = []
+    for depth in depths:
+        circuits = [
+            random_circuit(
+                coupling_map, single_qubit_basis_gates, two_qubits_gates, width, depth,
+                None if seed is None else [seed, depth, i],
+            )
+            for i in range(n_circuits)
+        ]
+        restricted = [unm.restrict_to_circuit(circuit)[:2] for circuit in circuits]
+        if references is None:
+            reference_counts = run_counts(
+                ideal_simulator, [circuit for _, circuit in restricted], shots,
+            )
+        else:
+            reference_counts = np.asarray(references[depth])
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        counts = np.concatenate([
+            run_counts(AerSimulator(noise_model=noise_model), [circuit], shots)
+            for noise_model, circuit in restricted
+        ])
+        wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        distances = hellinger_distance(counts, reference_counts)
+        report = {
+            'depth': depth,
+            'width': width,
+            'n_circuits': n_circuits,
+            'hellinger_mean': float(distances.mean()),
+            'hellinger_std': float(distances.std()),
+            'wall_time': wall_time,
+            'peak_python_memory_mb': peak_memory / 2**20,
+            'max_rss_mb': get_max_rss_mb(),
+            'build_time': build_time,
+        }
+        reports.append(report)
+        if store is not None:
+            store.append(report)
+
+    return reports
@@ -0,0 +1,205 @@
+from collections import OrderedDict
+import datetime
+import glob
+import os
+import re
+import numpy as np
+
+try:
+    from .Unified_Noise_Model import EDGE_DTYPE, Unified_Noise_Model
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from Unified_Noise_Model import EDGE_DTYPE, Unified_Noise_Model
+
+# date, and optionally time, in the name of a calibration file, like ibm_brisbane_2024-03-01.csv
+# or ibm_brisbane_20240301T1530.csv
+TIMESTAMP_PATTERN = re.compile(
+    r'(\d{4})-?(\d{2})-?(\d{2})(?:[T_ ]?(\d{2})[:\-]?(\d{2})(?:[:\-]?(\d{2}))?)?'
+)
+
+
+def get_file_timestamp(path):
+    '''Returns the timestamp of a calibration file, read from its name or, if it has no date, its
+    modification time.'''
+    match = TIMESTAMP_PATTERN.search(os.path.basename(path))
+    if match:
+        fields = [int(field) if field else 0 for field in match.groups()]
+        return np.datetime64(datetime.datetime(*fields), 's')
+    return np.datetime64(int(os.path.getmtime(path)), 's')
+
+
+class Calibration_History:
+    """Time series of the calibration csv files of a device, collected in a directory.
+
+    The files are parsed once into stacked arrays of each quantity, qubit x time and edge x time,
+    so drift studies loop over arrays instead of parsing the files again. The noise models of the
+    timestamps are built lazily from the columns of these arrays, when requested, and the most
+    recent ones are cached.
+    """
+
+    def __init__(
+        self,
+        directory,
+        single_qubit_basis_gates,
+        two_qubits_basis_gates,
+        properties=None,
+        pattern='*.csv',
+        cache_size=4,
+        snapshot_directory=None,
+    ):
+        """Create the history of the calibration files of a directory.
+
+        Args:
+            directory(str): directory of the calibration csv files.
+            single_qubit_basis_gates(list[str]): single qubit basis gates, as in
+                                                 add_calibration_data.
+            two_qubits_basis_gates(list[str]): two qubits basis gates, as in add_calibration_data.
+            properties: device properties with the gates times, as in add_calibration_data. They
+                        are shared by all the timestamps.
+            pattern(str): glob pattern of the calibration files in the directory.
+            cache_size(int): noise models kept in memory.
+            snapshot_directory(str): if given, the models are saved there as snapshots (see
+                                     Unified_Noise_Model.from_arrays), so they are built once
+                                     between sessions.
+        """
+        self.single_qubit_basis_gates = list(single_qubit_basis_gates)
+        self.two_qubits_basis_gates = list(two_qubits_basis_gates)
+        self.properties = properties
+        self.cache_size = cache_size
+        self.snapshot_directory = snapshot_directory
+        self._models = OrderedDict()
+
+        paths = glob.glob(os.path.join(directory, pattern))
+        timestamps = [get_file_timestamp(path) for path in paths]
+        order = np.argsort(timestamps, kind='stable')
+        self.paths = [paths[i] for i in order]
+        self.timestamps = np.array(timestamps, dtype='datetime64[s]')[order]
+
+        # stacked arrays, filled by _loadArrays
+        self.qubits = None
+        self.edges = None
+        self.T1s = None
+        self.T2s = None
+        self.single_qubit_error_rates = None
+        self.measurement_error_rates = None
+        self.readout_lengths = None
+        self.two_qubits_error_rates = None
+        self.two_qubits_gates_times = None
+        self.calibration_hashes = None
+        self._loadArrays()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _loadArrays(self):
+        '''Parses every calibration file and stacks its quantities as float[qubits][times] and
+        float[edges][times] arrays, over the union of the qubits and edges of all the files. The
+        quantities missing in a file are NaN.'''
+        calibrations = [self._readCalibration(path) for path in self.paths]
+        self.calibration_hashes = [calibration.calibration_hash for calibration in calibrations]
+
+        self.qubits = sorted({
+            qubit for calibration in calibrations for qubit in calibration.qubits
+        })
+        self.edges = sorted({
+            edge for calibration in calibrations
+            for edge in zip(calibration.edges['src'].tolist(), calibration.edges['dst'].tolist())
+        })
+        qubits_index = {qubit: i for i, qubit in enumerate(self.qubits)}
+        edges_index = {edge: i for i, edge in enumerate(self.edges)}
+
+        qubits_shape = (len(self.qubits), len(self.paths))
+        edges_shape = (len(self.edges), len(self.paths))
+        self.T1s = np.full(qubits_shape, np.nan)
+        self.T2s = np.full(qubits_shape, np.nan)
+        self.single_qubit_error_rates = np.full(qubits_shape, np.nan)
+        self.measurement_error_rates = np.full(qubits_shape, np.nan)
+        self.readout_lengths = np.full(qubits_shape, np.nan)
+        self.two_qubits_error_rates = np.full(edges_shape, np.nan)
+        self.two_qubits_gates_times = np.full(edges_shape, np.nan)
+
+        for time, calibration in enumerate(calibrations):
+            rows = [qubits_index[qubit] for qubit in calibration.qubits]
+            self.T1s[rows, time] = calibration.T1s
+            self.T2s[rows, time] = calibration.T2s
+            self.single_qubit_error_rates[rows, time] = calibration.single_qubit_error_rates
+            self.measurement_error_rates[rows, time] = calibration.measurement_error_rates
+            if calibration.readout_lengths is not None:
+                self.readout_lengths[rows, time] = calibration.readout_lengths
+
+            edges = calibration.edges
+            rows = [
+                edges_index[edge] for edge in zip(edges['src'].tolist(), edges['dst'].tolist())
+            ]
+            self.two_qubits_error_rates[rows, time] = calibration.edges['error']
+            self.two_qubits_gates_times[rows, time] = calibration.edges['gate_time']
+
+    def _readCalibration(self, path):
+        '''Returns a model with only the parsed calibration data of a file, without its channels
+        nor the gates times of the properties.'''
+        calibration = Unified_Noise_Model()
+        calibration.add_calibration_data(
+            path, self.single_qubit_basis_gates, self.two_qubits_basis_gates, verbose=False,
+        )
+        return calibration
+
+    def index_at(self, timestamp):
+        '''Returns the index of the last calibration at or before a timestamp (a datetime, a
+        np.datetime64 or an ISO string).'''
+        index = np.searchsorted(self.timestamps, np.datetime64(timestamp, 's'), side='right') - 1
+        if index < 0:
+            raise ValueError('There is no calibration before ' + str(timestamp))
+        return int(index)
+
+    def get_model(self, index):
+        '''Returns the noise model (add_calibration_arrays + add_all_noise_channels2) of the
+        calibration of an index, built from the column index of the stacked arrays, only if it is
+        not cached.'''
+        if index in self._models:
+            self._models.move_to_end(index)
+            return self._models[index]
+
+        snapshot_path = None
+        if self.snapshot_directory is not None:
+            os.makedirs(self.snapshot_directory, exist_ok=True)
+            name = os.path.splitext(os.path.basename(self.paths[index]))[0]
+            snapshot_path = os.path.join(self.snapshot_directory, name + '.pkl')
+
+        # the qubits and edges of the file, the others are NaN in its column
+        qubits = ~np.isnan(self.single_qubit_error_rates[:, index])
+        edges_rows = np.flatnonzero(~np.isnan(self.two_qubits_error_rates[:, index]))
+        edges = np.empty(len(edges_rows), dtype=EDGE_DTYPE)
+        edges['src'] = [self.edges[row][0] for row in edges_rows]
+        edges['dst'] = [self.edges[row][1] for row in edges_rows]
+        edges['error'] = self.two_qubits_error_rates[edges_rows, index]
+        edges['gate_time'] = self.two_qubits_gates_times[edges_rows, index]
+        readout_lengths = self.readout_lengths[qubits, index]
+
+        model = Unified_Noise_Model.from_arrays(
+            np.asarray(self.qubits)[qubits].tolist(),
+            self.single_qubit_basis_gates,
+            self.two_qubits_basis_gates,
+            self.single_qubit_error_rates[qubits, index],
+            self.measurement_error_rates[qubits, index],
+            self.T1s[qubits, index],
+            self.T2s[qubits, index],
+            edges,
+            None if np.isnan(readout_lengths).all() else readout_lengths,
+            properties=self.properties,
+            calibration_hash=self.calibration_hashes[index],
+            snapshot_path=snapshot_path,
+        )
+        self._models[index] = model
+        if len(self._models) > self.cache_size:
+            self._models.popitem(last=False)
+        return model
+
+    def get_model_at(self, timestamp):
+        '''Returns the noise model of the last calibration at or before a timestamp.'''
+        return self.get_model(self.index_at(timestamp))
+
+    def models(self, indexes=None):
+        '''Yields (timestamp, model) for the calibrations of the indexes, all of them if None,
+        building each model when it is reached.'''
+        for index in range(len(self)) if indexes is None else indexes:
+            yield self.timestamps[index], self.get_model(index)
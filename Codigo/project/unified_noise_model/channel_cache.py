@@ -0,0 +1,145 @@
+from collections import OrderedDict
+import math
+from qiskit.quantum_info import SuperOp
+from qiskit_aer.noise import depolarizing_error, pauli_error, thermal_relaxation_error
+
+
+class Channel_Cache:
+    """Memoizing factory of the QuantumError objects used by the UNM.
+
+    The channels are cached by their parameters (T1, T2, gate time, probabilities), so qubits and
+    gates with the same parameters share the same QuantumError object, and the composed and
+    expanded channels are reused between builds.
+    """
+
+    def __init__(self, maxsize=4096, tolerance=None):
+        """Create an empty cache.
+
+        Args:
+            maxsize(int): maximum amount of cached channels. When it is reached, the least recently
+                          used channel is evicted.
+            tolerance(float): relative tolerance used to quantize the parameters of the channels,
+                              which are rounded to the significant digits it implies. If None, the
+                              parameters are used as they are.
+        """
+        self.maxsize = maxsize
+        self.tolerance = tolerance
+
+        self._channels = OrderedDict()
+        # id of each cached channel -> its key, so composed channels can be cached too
+        self._keys = {}
+        # superoperators of the cached channels, computed on demand
+        self._superops = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        '''Returns a dict with the hits, misses, evictions and size of the cache.'''
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._channels),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self):
+        '''Removes all the cached channels and resets the stats.'''
+        self._channels.clear()
+        self._keys.clear()
+        self._superops.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, value):
+        '''Returns the value rounded to the relative tolerance of the cache.'''
+        value = float(value)
+        if not self.tolerance or value == 0 or not math.isfinite(value):
+            return value
+        # keeps the significant digits needed to respect the tolerance
+        digits = max(1, math.ceil(-math.log10(self.tolerance)))
+        return float('%.*g' % (digits, value))
+
+    def thermal_relaxation_error(self, t1, t2, time):
+        '''Returns the cached thermal_relaxation_error(t1, t2, time). The quantized t2 is clamped to
+        2*t1, as rounding can break T2 <= 2*T1.'''
+        t1, t2, time = self.quantize(t1), self.quantize(t2), self.quantize(time)
+        t2 = min(t2, 2 * t1)
+        return self._get(
+            ('thermal_relaxation', t1, t2, time),
+            lambda: thermal_relaxation_error(t1, t2, time),
+        )
+
+    def depolarizing_error(self, prob, num_qubits):
+        '''Returns the cached depolarizing_error(prob, num_qubits).'''
+        prob = self.quantize(prob)
+        return self._get(
+            ('depolarizing', prob, num_qubits),
+            lambda: depolarizing_error(prob, num_qubits),
+        )
+
+    def pauli_error(self, noise_ops):
+        '''Returns the cached pauli_error(noise_ops). With a tolerance, the probabilities but the
+        largest one are quantized, and the largest one is set to the rest of 1, so they stay
+        normalized.'''
+        probabilities = [self.quantize(prob) for _, prob in noise_ops]
+        if self.tolerance and probabilities:
+            largest = max(range(len(noise_ops)), key=lambda i: noise_ops[i][1])
+            others = probabilities[:largest] + probabilities[largest + 1:]
+            probabilities[largest] = 1 - math.fsum(others)
+        noise_ops = tuple((op, prob) for (op, _), prob in zip(noise_ops, probabilities))
+        return self._get(('pauli', noise_ops), lambda: pauli_error(list(noise_ops)))
+
+    def compose(self, error, other):
+        '''Returns error.compose(other). It is cached only if both errors come from this cache.'''
+        return self._combine('compose', error, other)
+
+    def expand(self, error, other):
+        '''Returns error.expand(other). It is cached only if both errors come from this cache.'''
+        return self._combine('expand', error, other)
+
+    def superop(self, error):
+        '''Returns the SuperOp of an error. The superoperators of the composed and expanded channels
+        of the cache are computed from the ones of their parts, which are cached too.'''
+        key = self._keys.get(id(error))
+        if key is None:
+            return SuperOp(error.to_quantumchannel())
+        if key not in self._superops:
+            if (key[0] in ('compose', 'expand') and key[1] in self._channels
+                    and key[2] in self._channels):
+                first = self.superop(self._channels[key[1]])
+                second = self.superop(self._channels[key[2]])
+                self._superops[key] = getattr(first, key[0])(second)
+            else:
+                self._superops[key] = SuperOp(error.to_quantumchannel())
+        return self._superops[key]
+
+    def _combine(self, operation, error, other):
+        key = self._keys.get(id(error)), self._keys.get(id(other))
+        if None in key:
+            return getattr(error, operation)(other)
+        return self._get((operation,) + key, lambda: getattr(error, operation)(other))
+
+    def _get(self, key, create):
+        if key in self._channels:
+            self.hits += 1
+            self._channels.move_to_end(key)
+            return self._channels[key]
+
+        self.misses += 1
+        error = create()
+        self._channels[key] = error
+        self._keys[id(error)] = key
+        if len(self._channels) > self.maxsize:
+            evicted_key, evicted = self._channels.popitem(last=False)
+            del self._keys[id(evicted)]
+            self._superops.pop(evicted_key, None)
+            self.evictions += 1
+        return error
+
+
+# cache shared by all the models, so repeated builds reuse their channels
+default_channel_cache = Channel_Cache()
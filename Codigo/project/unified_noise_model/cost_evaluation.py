@@ -0,0 +1,111 @@
+import numpy as np
+from qiskit import transpile
+from qiskit_aer import AerSimulator
+
+try:
+    from .Unified_Noise_Model import Unified_Noise_Model
+    from .cost_tables import Dense_Cost_Table, Sparse_Cost_Table
+    from .executors import run_counts, run_sparse_counts
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from Unified_Noise_Model import Unified_Noise_Model
+    from cost_tables import Dense_Cost_Table, Sparse_Cost_Table
+    from executors import run_counts, run_sparse_counts
+
+
+class Cost_Evaluator:
+    """Cost evaluation engine for variational loops over a parametric circuit.
+
+    The circuit is transpiled once, through the model if it is a Unified_Noise_Model, and the
+    simulator is created once. Each call binds a whole population of parameter vectors into the
+    transpiled circuit, runs them as a single simulator.run call and computes their average costs
+    with a cost table. With a Sparse_Cost_Table, only the
+    observed outcomes of each run are kept, so circuits with more classical bits than the dense
+    count arrays allow can be evaluated.
+    """
+
+    def __init__(
+        self,
+        circuit,
+        cost_table,
+        noise_model=None,
+        shots=4000,
+        seed=None,
+        **transpile_options,
+    ):
+        """Create a cost evaluator.
+
+        Args:
+            circuit(QuantumCircuit): parametric circuit, with its measurements. The parameter
+                                     vectors follow the order of circuit.parameters.
+            cost_table(Dense_Cost_Table, Sparse_Cost_Table or function): cost table of the
+                                     outcomes, or a cost function over bitstrings, like the keys of
+                                     the counts, to compile into a dense table.
+            noise_model(Unified_Noise_Model or NoiseModel): noise model of the simulator. A
+                                     Unified_Noise_Model transpiles the circuit with unm.transpile,
+                                     so it gets the noisy basis gates and the coupling map of the
+                                     calibration data. A NoiseModel, like the ones built with
+                                     add_all_noise_channels, only sets the basis gates.
+            shots(int): shots of each parameter vector.
+            seed(int): seed of the simulator.
+            transpile_options: options for transpile, like coupling_map or initial_layout.
+        """
+        self.parameters = list(circuit.parameters)
+        if isinstance(noise_model, Unified_Noise_Model):
+            self.circuit = noise_model.transpile(circuit, **transpile_options)
+            noise_model = noise_model.noise_model
+        else:
+            if noise_model is not None:
+                transpile_options.setdefault('basis_gates', noise_model.basis_gates)
+            self.circuit = transpile(circuit, **transpile_options)
+        self.simulator = AerSimulator(noise_model=noise_model)
+        self.shots = shots
+        self.seed = seed
+
+        if callable(cost_table):
+            cost_table = Dense_Cost_Table.from_function(cost_table, self.circuit.num_clbits)
+        self.cost_table = cost_table
+
+        # index in the parameter vectors of each parameter left in the transpiled circuit
+        parameters_index = {parameter: i for i, parameter in enumerate(self.parameters)}
+        self._parametersIndex = [
+            (parameter, parameters_index[parameter]) for parameter in self.circuit.parameters
+        ]
+
+    def evaluate(self, population):
+        '''Returns the average costs of a population of parameter vectors.
+
+        Args:
+            population(array): float[vectors][parameters] with the parameter vectors.
+
+        Returns:
+            ndarray: float[vectors] with the average cost of each vector.
+        '''
+        population = np.atleast_2d(np.asarray(population, dtype=float))
+        if not self._parametersIndex:
+            # the transpiled circuit has no parameters to bind
+            circuits = [self.circuit] * len(population)
+            run_options = {}
+        else:
+            circuits = [self.circuit]
+            run_options = {'parameter_binds': [{
+                parameter: population[:, i].tolist() for parameter, i in self._parametersIndex
+            }]}
+
+        if isinstance(self.cost_table, Sparse_Cost_Table):
+            experiments, outcomes, counts = run_sparse_counts(
+                self.simulator, circuits, self.shots, seed_simulator=self.seed, **run_options,
+            )
+            return self.cost_table.expectation_sparse(
+                experiments, outcomes, counts, len(population),
+            )
+
+        counts = run_counts(
+            self.simulator, circuits, self.shots, seed_simulator=self.seed, **run_options,
+        )
+        return self.cost_table.expectation(counts)
+
+    def __call__(self, parameters):
+        '''Returns the average cost of one parameter vector, so the evaluator can be used as the fun
+        of scipy.optimize.minimize.'''
+        return self.evaluate([parameters])[0]
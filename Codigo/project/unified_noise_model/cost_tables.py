@@ -0,0 +1,121 @@
+import numpy as np
+
+try:
+    from .executors import MAX_DENSE_CLBITS, bitstring_to_index, keys_to_indexes
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from executors import MAX_DENSE_CLBITS, bitstring_to_index, keys_to_indexes
+
+
+class Dense_Cost_Table:
+    """Cost of each outcome of n classical bits, as a vector of 2**n costs indexed by the integer
+    value of the bitstrings. The costs of count arrays are computed with a dot product."""
+
+    def __init__(self, costs):
+        """Create a dense cost table.
+
+        Args:
+            costs(array): float[2**num_bits] with the cost of each outcome.
+        """
+        self.costs = np.asarray(costs, dtype=float)
+        self.num_bits = int(np.log2(len(self.costs)))
+        if len(self.costs) != 2**self.num_bits:
+            raise ValueError('The length of the costs must be a power of 2.')
+
+    @classmethod
+    def from_function(cls, cost_function, num_bits):
+        '''Returns the table of a cost function over bitstrings, like get_cost(key), calling it once
+        for each outcome.'''
+        cls._checkNumBits(num_bits)
+        return cls([
+            cost_function(format(outcome, '0' + str(num_bits) + 'b'))
+            for outcome in range(2**num_bits)
+        ])
+
+    @classmethod
+    def from_bits_function(cls, cost_function, num_bits):
+        '''Returns the table of a vectorized cost function, called once with the
+        int[2**num_bits][num_bits] array of the bits of all the outcomes, in the order of the
+        bitstrings (the last bit is the classical bit 0). For example, lambda bits: bits.sum(axis=1)
+        for the Hamming weight.'''
+        cls._checkNumBits(num_bits)
+        outcomes = np.arange(2**num_bits)
+        bits = (outcomes[:, None] >> np.arange(num_bits - 1, -1, -1)) & 1
+        return cls(cost_function(bits))
+
+    def expectation(self, counts):
+        '''Returns the average costs of count (or probability) arrays, float[...][2**num_bits].'''
+        counts = np.asarray(counts)
+        return counts @ self.costs / counts.sum(axis=-1)
+
+    @staticmethod
+    def _checkNumBits(num_bits):
+        if num_bits > MAX_DENSE_CLBITS:
+            raise ValueError(
+                'Too many classical bits (' + str(num_bits) + ') for a dense cost table, use a '
+                'Sparse_Cost_Table.',
+            )
+
+
+class Sparse_Cost_Table:
+    """Cost of each outcome of n classical bits, as a default cost and the costs of the outcomes
+    that differ from it. It is meant for large n, where a dense table does not fit in memory."""
+
+    def __init__(self, num_bits, default, costs):
+        """Create a sparse cost table.
+
+        Args:
+            num_bits(int): number of classical bits of the outcomes.
+            default(float): cost of the outcomes not in costs.
+            costs(dict): cost of the other outcomes, keyed by their bitstrings or integer values.
+        """
+        self.num_bits = num_bits
+        self.default = float(default)
+        indexes = np.array([
+            bitstring_to_index(outcome) if isinstance(outcome, str) else outcome
+            for outcome in costs
+        ], dtype=np.uint64)
+        # the costs are saved relative to the default cost, sorted by outcome for np.searchsorted
+        order = np.argsort(indexes)
+        self.indexes = indexes[order]
+        self.deltas = (np.array(list(costs.values()), dtype=float) - self.default)[order]
+
+    def expectation(self, counts):
+        '''Returns the average costs of count (or probability) arrays, float[...][2**num_bits].'''
+        counts = np.asarray(counts)
+        totals = counts.sum(axis=-1)
+        return self.default + counts[..., self.indexes.astype(np.int64)] @ self.deltas / totals
+
+    def expectation_counts(self, counts):
+        '''Returns the average cost of a counts dict, keyed by bitstrings or by the hexadecimal keys
+        of the Aer results ("0x5"), without building a dense array.'''
+        values = np.fromiter(counts.values(), dtype=float, count=len(counts))
+        return self.default + values @ self._getDeltas(keys_to_indexes(counts)) / values.sum()
+
+    def expectation_sparse(self, experiments, outcomes, counts, num_experiments=None):
+        '''Returns the average costs of the experiments of sparse counts, like the output of
+        run_sparse_counts, float[num_experiments].
+
+        Args:
+            experiments(ndarray): int[entries] with the experiment of each entry.
+            outcomes(ndarray): uint64[entries] with the outcome of each entry.
+            counts(ndarray): int[entries] with the count of each entry.
+            num_experiments(int): number of experiments, by default the last experiment + 1.
+        '''
+        counts = np.asarray(counts, dtype=float)
+        if num_experiments is None:
+            num_experiments = int(experiments.max()) + 1 if len(experiments) else 0
+        costs = np.bincount(
+            experiments, weights=counts * self._getDeltas(outcomes), minlength=num_experiments,
+        )
+        totals = np.bincount(experiments, weights=counts, minlength=num_experiments)
+        return self.default + costs / totals
+
+    def _getDeltas(self, outcomes):
+        '''Returns the costs relative to the default cost of some outcomes, uint64[outcomes],
+        looking them up in the sorted table.'''
+        outcomes = np.asarray(outcomes, dtype=np.uint64)
+        if len(self.indexes) == 0:
+            return np.zeros(len(outcomes))
+        positions = np.minimum(np.searchsorted(self.indexes, outcomes), len(self.indexes) - 1)
+        return np.where(self.indexes[positions] == outcomes, self.deltas[positions], 0)
@@ -0,0 +1,158 @@
+import numpy as np
+
+# circuits with more classical bits than this can not be stored as dense arrays
+MAX_DENSE_CLBITS = 24
+
+
+# circuits with more classical bits than this can not be keyed by uint64 outcomes
+MAX_SPARSE_CLBITS = 64
+
+# value of the digits of the count keys, indexed by their unicode code point
+_KEY_DIGITS = np.zeros(128, dtype=np.uint64)
+_KEY_DIGITS[np.frombuffer(b'0123456789abcdef', dtype=np.uint8)] = np.arange(16, dtype=np.uint64)
+_KEY_DIGITS[np.frombuffer(b'ABCDEF', dtype=np.uint8)] = np.arange(10, 16, dtype=np.uint64)
+
+
+def bitstring_to_index(bitstring):
+    '''Returns the index of a bitstring, like "010" or "01 1", in the dense count arrays.'''
+    return int(bitstring.replace(' ', ''), 2)
+
+
+def keys_to_indexes(keys):
+    '''Returns the integer values of count keys, all of them bitstrings (like "01 1") or Aer
+    hexadecimal keys ("0x5"), as a uint64 array. The keys are parsed with numpy operations over
+    their characters instead of one int call per key.
+
+    Raises:
+        ValueError: if a key has more than MAX_SPARSE_CLBITS bits.
+    '''
+    keys = np.asarray(list(keys), dtype=str)
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    if keys[0].startswith('0x'):
+        bits_per_digit = 4
+        keys = np.char.replace(keys, '0x', '')
+    else:
+        bits_per_digit = 1
+        keys = np.char.replace(keys, ' ', '')
+    keys = np.ascontiguousarray(keys)
+
+    lengths = np.char.str_len(keys)
+    if bits_per_digit * lengths.max() > MAX_SPARSE_CLBITS:
+        raise ValueError(
+            'Too many classical bits (' + str(bits_per_digit * lengths.max()) + ') for uint64 '
+            'outcomes.',
+        )
+
+    # the characters are left aligned, the digit i of a key of length l has the weight l - 1 - i
+    codes = keys.view(np.uint32).reshape(len(keys), -1)
+    shifts = bits_per_digit * (lengths[:, np.newaxis] - 1 - np.arange(codes.shape[1]))
+    digits = np.where(shifts >= 0, _KEY_DIGITS[np.minimum(codes, 127)], 0)
+    return (digits << np.maximum(shifts, 0).astype(np.uint64)).sum(axis=1, dtype=np.uint64)
+
+
+def counts_to_array(counts, num_clbits):
+    '''Returns a counts dict as a dense int array of length 2**num_clbits, indexed by the integer
+    value of each bitstring. The keys can be bitstrings or Aer hexadecimal keys ("0x5").'''
+    if num_clbits > MAX_DENSE_CLBITS:
+        raise ValueError(
+            'Too many classical bits (' + str(num_clbits) + ') for a dense count array.',
+        )
+
+    array = np.zeros(2**num_clbits, dtype=np.int64)
+    if counts:
+        array[keys_to_indexes(counts).astype(np.int64)] = list(counts.values())
+
+    return array
+
+
+def run_counts(simulator, circuits, shots, probabilities=False, **run_options):
+    '''Runs all the circuits, which must have the same number of classical bits, in a single
+    simulator.run call. The run_options, like parameter_binds, are passed to simulator.run.
+
+    Returns:
+        ndarray: int[experiments][2**num_clbits] with the counts of each experiment (each circuit,
+        or each parameters binding), or the probabilities if probabilities is True.
+    '''
+    num_clbits = circuits[0].num_clbits
+    if any(circuit.num_clbits != num_clbits for circuit in circuits):
+        raise ValueError('All the circuits must have the same number of classical bits.')
+
+    result = simulator.run(circuits, shots=shots, **run_options).result()
+    counts = np.stack([
+        counts_to_array(result.data(i).get('counts', {}), num_clbits)
+        for i in range(len(result.results))
+    ])
+
+    if probabilities:
+        return counts / counts.sum(axis=1, keepdims=True)
+    return counts
+
+
+def run_sparse_counts(simulator, circuits, shots, **run_options):
+    '''Runs all the circuits in a single simulator.run call, like run_counts, but keeps only the
+    observed outcomes, so circuits with more than MAX_DENSE_CLBITS classical bits can be run.
+
+    Returns:
+        tuple: flat arrays with an entry for each observed outcome of each experiment: the
+        experiment, int[entries], the outcome, uint64[entries], and its count, int[entries].
+    '''
+    result = simulator.run(circuits, shots=shots, **run_options).result()
+    experiments_counts = [result.data(i).get('counts', {}) for i in range(len(result.results))]
+
+    experiments = np.repeat(
+        np.arange(len(experiments_counts)), [len(counts) for counts in experiments_counts],
+    )
+    outcomes = keys_to_indexes([key for counts in experiments_counts for key in counts])
+    counts = np.fromiter(
+        (count for counts in experiments_counts for count in counts.values()),
+        dtype=np.int64,
+        count=len(experiments),
+    )
+    return experiments, outcomes, counts
+
+
+class Batched_Executor:
+    """Executor for UNM-backed simulators that keeps the full count distributions.
+
+    One simulation pass over a list of circuits gives dense count arrays, from which the counts of
+    any number of observables (bitstrings) can be evaluated without running them again.
+    """
+
+    def __init__(self, simulator, shots):
+        """Create a batched executor.
+
+        Args:
+            simulator(AerSimulator): simulator which runs the circuits, for example
+                                     AerSimulator(noise_model=unm.noise_model).
+            shots(int): shots of each circuit.
+        """
+        self.simulator = simulator
+        self.shots = shots
+
+        # counts of the last run, int[circuits][2**num_clbits]
+        self.counts = None
+
+    def run(self, circuits):
+        '''Runs the circuits in a single simulator.run call and returns their dense count arrays.'''
+        self.counts = run_counts(self.simulator, list(circuits), self.shots)
+        return self.counts
+
+    def probabilities(self):
+        '''Returns the probabilities of the last run, float[circuits][2**num_clbits].'''
+        return self.counts / self.counts.sum(axis=1, keepdims=True)
+
+    def evaluate(self, observables):
+        '''Returns the counts of the observables in the last run, int[circuits][observables].'''
+        indexes = [bitstring_to_index(observable) for observable in observables]
+        return self.counts[:, indexes]
+
+    def create_mitiq_executor(self, observable):
+        '''Returns a batched mitiq executor which runs a list of circuits and returns the counts of
+        the observable for each one. The full distributions are kept in self.counts.'''
+        index = bitstring_to_index(observable)
+
+        def executor(circuits) -> list[float]:
+            return self.run(circuits)[:, index].tolist()
+
+        return executor
@@ -0,0 +1,345 @@
+import heapq
+import math
+import numpy as np
+
+try:
+    from .Unified_Noise_Model import Unified_Noise_Model
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from Unified_Noise_Model import Unified_Noise_Model
+
+
+class Layout_Search:
+    """Search of the best initial layouts of a circuit over a device, from the calibration data of a
+    Unified_Noise_Model.
+
+    The device is a graph of its physical qubits and edges. Each layout is scored by its log
+    fidelity, the sum over the gates and measurements of the circuit of the log(1 - error rate) of
+    their physical qubits or edge, looked up in tables computed once for the device. The virtual
+    qubits with two qubits gates are placed over connected physical qubits by a depth first branch
+    and bound, which drops every partial layout whose score plus an upper bound of the rest can not
+    beat the k best layouts found so far.
+
+    If the interaction graph of the circuit does not embed in the device, the layouts are searched
+    over connected sets of physical qubits instead, and the two qubits gates between uncoupled
+    qubits are scored with the SWAPs of the best path between them (see
+    get_routed_log_fidelities).
+    """
+
+    def __init__(self, noise_model, call_limit=100000):
+        """Create a layout search.
+
+        Args:
+            noise_model(Unified_Noise_Model): model with calibration data, which gives the single
+                                              qubit, two qubits and measurement error rates.
+            call_limit(int): maximum number of partial layouts visited by each search. If it is
+                             reached, the best layouts found until then are returned, which may
+                             not be the best ones.
+        """
+        self.call_limit = call_limit
+
+        # log fidelities of each physical qubit and edge, the qubits without calibration data are
+        # never chosen
+        (
+            self.single_qubit_log_fidelities,
+            self.readout_log_fidelities,
+            self.two_qubits_log_fidelities,
+        ) = noise_model.get_log_fidelities()
+        self.calibrated = (
+            np.isfinite(self.single_qubit_log_fidelities)
+            & np.isfinite(self.readout_log_fidelities)
+        )
+        num_qubits = len(self.single_qubit_log_fidelities)
+        src = noise_model.edges['src'].tolist()
+        dst = noise_model.edges['dst'].tolist()
+
+        # neighbors of each physical qubit in the device graph
+        self.neighbors = [set() for _ in range(num_qubits)]
+        for qubit, second_qubit in zip(src, dst):
+            if qubit != second_qubit:
+                self.neighbors[qubit].add(second_qubit)
+                self.neighbors[second_qubit].add(qubit)
+        self.neighbors = [sorted(neighbors) for neighbors in self.neighbors]
+        self.max_two_qubits_log_fidelity = (
+            float(self.two_qubits_log_fidelities[src, dst].max()) if src else -np.inf
+        )
+        # computed on the first search without embeddings
+        self._routedLogFidelities = None
+
+    def get_routed_log_fidelities(self):
+        '''Returns the log fidelities of a two qubits gate between each pair of physical qubits,
+        float[qubits][qubits], routed along the best path between them: 3 gates for each SWAP that
+        moves the first qubit next to the second one, plus the gate itself. For coupled qubits,
+        this is the log fidelity of their edge. The SWAPs are scored as if they were undone, so
+        this is a penalty of the distance rather than a routing of the circuit.'''
+        if self._routedLogFidelities is None:
+            edges_log_fidelities = self.two_qubits_log_fidelities
+            # best path log fidelities, by the Floyd-Warshall algorithm over the (max, +) semiring
+            paths = edges_log_fidelities.copy()
+            np.fill_diagonal(paths, 0)
+            for qubit in range(len(paths)):
+                paths = np.maximum(paths, paths[:, qubit, np.newaxis] + paths[np.newaxis, qubit])
+
+            routed = np.full(paths.shape, -np.inf)
+            for qubit in range(len(paths)):
+                routed = np.maximum(
+                    routed,
+                    3 * paths[:, qubit, np.newaxis] + edges_log_fidelities[np.newaxis, qubit],
+                )
+            self._routedLogFidelities = np.maximum(routed, routed.T)
+        return self._routedLogFidelities
+
+    def get_interactions(self, circuit):
+        '''Returns the gates of a circuit over each virtual qubit and pair of virtual qubits.
+
+        Returns:
+            tuple: the single qubit gates and the measurements of each qubit, int[qubits], and the
+            two qubits gates, as dict[(qubit, second_qubit)] = count with qubit < second_qubit.
+
+        Raises:
+            ValueError: if the circuit has an instruction over more than two qubits.
+        '''
+        names, qubits = Unified_Noise_Model.get_circuit_instructions(circuit)
+        measures = np.array([name == 'measure' for name in names], dtype=bool)
+        single_qubit = (qubits[:, 0] == qubits[:, 1]) & ~measures
+        single_qubit_gates = np.bincount(qubits[single_qubit, 0], minlength=circuit.num_qubits)
+        measurements = np.bincount(qubits[measures, 0], minlength=circuit.num_qubits)
+
+        pairs, counts = np.unique(
+            np.sort(qubits[qubits[:, 0] != qubits[:, 1]], axis=1), axis=0, return_counts=True,
+        )
+        two_qubits_gates = dict(zip(map(tuple, pairs.tolist()), counts.tolist()))
+
+        return single_qubit_gates, measurements, two_qubits_gates
+
+    def score(self, circuit, layouts):
+        '''Returns the log fidelities of some layouts of a circuit, float[layouts].
+
+        Args:
+            circuit(QuantumCircuit): circuit over virtual qubits.
+            layouts(ndarray): int[layouts][virtual qubits] with the physical qubit of each virtual
+                              qubit.
+        '''
+        return self._getScores(self.get_interactions(circuit), np.atleast_2d(layouts))
+
+    def _getNodeScores(self, interactions):
+        '''Returns the log fidelities of the single qubit gates and measurements of each virtual
+        qubit over each physical qubit, float[virtual qubits][physical qubits], with -inf for the
+        physical qubits without calibration data.'''
+        single_qubit_gates, measurements, _ = interactions
+        single_qubit_log_fidelities = np.where(self.calibrated, self.single_qubit_log_fidelities, 0)
+        readout_log_fidelities = np.where(self.calibrated, self.readout_log_fidelities, 0)
+        node_scores = (
+            np.outer(single_qubit_gates, single_qubit_log_fidelities)
+            + np.outer(measurements, readout_log_fidelities)
+        )
+        node_scores[:, ~self.calibrated] = -np.inf
+        return node_scores
+
+    def _getScores(self, interactions, layouts, edges_log_fidelities=None):
+        '''Returns the log fidelities of the layouts, int[layouts][virtual qubits], of a circuit
+        with the given interactions, scoring the two qubits gates with edges_log_fidelities (by
+        default, the ones of the device edges).'''
+        if edges_log_fidelities is None:
+            edges_log_fidelities = self.two_qubits_log_fidelities
+        _, _, two_qubits_gates = interactions
+        node_scores = self._getNodeScores(interactions)
+        scores = node_scores[np.arange(layouts.shape[1]), layouts].sum(axis=1)
+        for (qubit, second_qubit), count in two_qubits_gates.items():
+            scores += count * edges_log_fidelities[layouts[:, qubit], layouts[:, second_qubit]]
+        return scores
+
+    def search(self, circuit, k=1):
+        '''Returns the k best layouts of a circuit over the device.
+
+        The virtual qubits with two qubits gates are placed by the branch and bound over connected
+        physical qubits. If their interaction graph does not embed in the device, they are placed
+        over connected sets of physical qubits, with the two qubits gates scored by
+        get_routed_log_fidelities. The other virtual qubits are placed afterwards on the best free
+        physical qubits, only for the k best layouts, so they do not take part in the bound.
+
+        The layouts can be used as the initial_layout of unm.transpile, and the transpiled circuit
+        with unm.restrict_to_circuit, or directly with unm.restrict_to_qubits.
+
+        Args:
+            circuit(QuantumCircuit): circuit over virtual qubits, with gates over at most two
+                                     qubits.
+            k(int): number of layouts.
+
+        Returns:
+            list: up to k tuples (layout, log fidelity), best first, where the layout is a
+            list[int] with the physical qubit of each virtual qubit. The log fidelities of the
+            routed layouts include the SWAPs of get_routed_log_fidelities.
+
+        Raises:
+            ValueError: if the device has not enough connected qubits for the circuit.
+        '''
+        interactions = self.get_interactions(circuit)
+        node_scores = self._getNodeScores(interactions)
+
+        edges_log_fidelities = self.two_qubits_log_fidelities
+        layouts = [layout for _, _, layout in self._branchAndBound(interactions, node_scores, k)]
+        if not layouts:
+            edges_log_fidelities = self.get_routed_log_fidelities()
+            layouts = [
+                layout for _, _, layout in self._branchAndBound(
+                    interactions, node_scores, k, edges_log_fidelities,
+                )
+            ]
+        if not layouts:
+            raise ValueError('No layout of the circuit over the device was found.')
+
+        best_layouts = np.array([
+            self._placeFreeQubits(np.array(layout, dtype=np.int64), interactions, node_scores)
+            for layout in layouts
+        ])
+        best_scores = self._getScores(interactions, best_layouts, edges_log_fidelities)
+        order = np.argsort(-best_scores, kind='stable')
+
+        return [(best_layouts[i].tolist(), float(best_scores[i])) for i in order]
+
+    def _getPlacementOrder(self, two_qubits_gates):
+        '''Returns the virtual qubits with two qubits gates in the order they are placed, breadth
+        first from the busiest qubit of each connected component, and the neighbors of each one
+        placed before it, as dict[qubit] = list[(neighbor, count)].'''
+        adjacency = {}
+        for (qubit, second_qubit), count in two_qubits_gates.items():
+            adjacency.setdefault(qubit, {})[second_qubit] = count
+            adjacency.setdefault(second_qubit, {})[qubit] = count
+
+        order = []
+        placed = set()
+        for root in sorted(adjacency, key=lambda qubit: -sum(adjacency[qubit].values())):
+            if root in placed:
+                continue
+            placed.add(root)
+            queue = [root]
+            for qubit in queue:
+                order.append(qubit)
+                for neighbor in sorted(adjacency[qubit], key=lambda n: -adjacency[qubit][n]):
+                    if neighbor not in placed:
+                        placed.add(neighbor)
+                        queue.append(neighbor)
+
+        position = {qubit: i for i, qubit in enumerate(order)}
+        previous_neighbors = {
+            qubit: [
+                (neighbor, count) for neighbor, count in adjacency[qubit].items()
+                if position[neighbor] < position[qubit]
+            ]
+            for qubit in order
+        }
+        return order, previous_neighbors
+
+    def _branchAndBound(self, interactions, node_scores, k, routed_log_fidelities=None):
+        '''Returns the k best placements of the virtual qubits with two qubits gates, as a list of
+        (score, index, layout) with -1 for the other virtual qubits, by a depth first search that
+        prunes the partial placements which can not beat the k best complete ones.
+
+        Without routed_log_fidelities, each qubit is placed next to its placed neighbors, so only
+        the embeddings of the interaction graph are found. With them, each qubit is placed next to
+        any placed qubit, so the placed qubits stay connected, and the two qubits gates are scored
+        with them.'''
+        _, _, two_qubits_gates = interactions
+        num_virtual_qubits = node_scores.shape[0]
+        order, previous_neighbors = self._getPlacementOrder(two_qubits_gates)
+        if not order:
+            return [(0.0, 0, [-1] * num_virtual_qubits)]
+
+        # upper bound of the score of the qubits from each position of the order on
+        best_node_scores = node_scores.max(axis=1)
+        bounds = np.zeros(len(order) + 1)
+        for i in range(len(order) - 1, -1, -1):
+            qubit = order[i]
+            edges_count = sum(count for _, count in previous_neighbors[qubit])
+            bounds[i] = (
+                bounds[i + 1] + best_node_scores[qubit]
+                + edges_count * self.max_two_qubits_log_fidelity
+            )
+
+        all_candidates = np.flatnonzero(self.calibrated).tolist()
+        # python lists are faster than numpy arrays to index one element at a time
+        calibrated = self.calibrated.tolist()
+        node_scores = node_scores.tolist()
+        routed = routed_log_fidelities is not None
+        two_qubits_log_fidelities = (
+            routed_log_fidelities if routed else self.two_qubits_log_fidelities
+        ).tolist()
+        layout = [-1] * num_virtual_qubits
+        used = set()
+        # min heap with the k best complete placements, as (score, index, layout)
+        best = []
+        visited = 0
+
+        def threshold():
+            return best[0][0] if len(best) == k else -np.inf
+
+        def place(position, score):
+            nonlocal visited
+            if position == len(order):
+                entry = (score, visited, list(layout))
+                if len(best) < k:
+                    heapq.heappush(best, entry)
+                else:
+                    heapq.heapreplace(best, entry)
+                return
+
+            qubit = order[position]
+            neighbors = previous_neighbors[qubit]
+            if routed and used:
+                candidates = sorted({
+                    neighbor for physical_qubit in used
+                    for neighbor in self.neighbors[physical_qubit]
+                })
+            elif neighbors:
+                candidates = self.neighbors[layout[neighbors[0][0]]]
+            else:
+                candidates = all_candidates
+
+            gains = []
+            for physical_qubit in candidates:
+                if physical_qubit in used or not calibrated[physical_qubit]:
+                    continue
+                gain = node_scores[qubit][physical_qubit]
+                for neighbor, count in neighbors:
+                    gain += count * two_qubits_log_fidelities[physical_qubit][layout[neighbor]]
+                # the qubits not coupled with all the placed neighbors give -inf
+                if math.isfinite(gain):
+                    gains.append((gain, physical_qubit))
+            # the best candidates first, so the threshold rises early
+            gains.sort(reverse=True)
+
+            for gain, physical_qubit in gains:
+                if visited >= self.call_limit:
+                    return
+                if score + gain + bounds[position + 1] <= threshold():
+                    break
+                visited += 1
+                layout[qubit] = physical_qubit
+                used.add(physical_qubit)
+                place(position + 1, score + gain)
+                used.discard(physical_qubit)
+            layout[qubit] = -1
+
+        place(0, 0.0)
+        return sorted(best, reverse=True)
+
+    def _placeFreeQubits(self, layout, interactions, node_scores):
+        '''Returns a copy of a layout with its unplaced virtual qubits (-1) placed over the free
+        physical qubits with the best fidelities for their gates, the busiest qubits first.'''
+        single_qubit_gates, measurements, _ = interactions
+        layout = layout.copy()
+        free = np.ones(node_scores.shape[1], dtype=bool)
+        free[layout[layout >= 0]] = False
+
+        unplaced = np.flatnonzero(layout < 0)
+        for qubit in unplaced[np.argsort(-(single_qubit_gates + measurements)[unplaced],
+                                         kind='stable')]:
+            # the qubits without calibration data are only used if nothing else is free
+            qubit_scores = np.where(
+                free, np.nan_to_num(node_scores[qubit], neginf=-1e300), -np.inf,
+            )
+            layout[qubit] = int(np.argmax(qubit_scores))
+            free[layout[qubit]] = False
+
+        return layout
@@ -0,0 +1,102 @@
+import itertools
+import numpy as np
+
+try:
+    from .executors import bitstring_to_index, counts_to_array
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from executors import bitstring_to_index, counts_to_array
+
+
+def normalize(counts):
+    '''Returns count arrays, float[...][2**num_clbits], normalized to probabilities. The rows
+    without counts are left as zeros.'''
+    counts = np.asarray(counts, dtype=float)
+    totals = counts.sum(axis=-1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+
+
+def hellinger_distance(counts, reference_counts):
+    '''Returns the Hellinger distances between stacked distributions, given as count or probability
+    arrays of the same shape, float[...][2**num_clbits]. The result has shape float[...].'''
+    probabilities = normalize(counts)
+    reference_probabilities = normalize(reference_counts)
+    bhattacharyya_coefficient = np.sqrt(probabilities * reference_probabilities).sum(axis=-1)
+    return np.sqrt(np.clip(1 - bhattacharyya_coefficient, 0, None))
+
+
+def total_variation_distance(counts, reference_counts):
+    '''Returns the total variation distances between stacked distributions, like
+    hellinger_distance.'''
+    return 0.5 * np.abs(normalize(counts) - normalize(reference_counts)).sum(axis=-1)
+
+
+def kl_divergence(counts, reference_counts, epsilon=0):
+    '''Returns the Kullback-Leibler divergences D(counts || reference_counts) between stacked
+    distributions, like hellinger_distance. It is infinite where the reference has no counts for an
+    outcome of counts, unless epsilon is added to the reference probabilities (and renormalized).'''
+    probabilities = normalize(counts)
+    reference_probabilities = normalize(reference_counts)
+    if epsilon:
+        reference_probabilities = normalize(reference_probabilities + epsilon)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = probabilities * (np.log(probabilities) - np.log(reference_probabilities))
+    return np.where(probabilities > 0, terms, 0).sum(axis=-1)
+
+
+def success_probability(counts, success_states):
+    '''Returns the probability of the successful outcomes in stacked distributions, float[...].
+
+    Args:
+        counts(array): float[...][2**num_clbits] count or probability arrays.
+        success_states(list): successful outcomes, as bitstrings or integer indexes.
+    '''
+    indexes = [
+        bitstring_to_index(state) if isinstance(state, str) else state for state in success_states
+    ]
+    return normalize(counts)[..., indexes].sum(axis=-1)
+
+
+# metrics that compare two distributions, by name
+DISTANCES = {
+    'hellinger': hellinger_distance,
+    'total_variation': total_variation_distance,
+    'kl': kl_divergence,
+}
+
+
+def stream_distances(counts, reference_counts, num_clbits, metrics=('hellinger',), chunk_size=256):
+    '''Computes distances between two large sequences of distributions, converting them to dense
+    arrays by chunks of chunk_size, so the whole result set is never held in memory as arrays.
+
+    Args:
+        counts(iterable): counts dicts (as in result.get_counts()) or count arrays.
+        reference_counts(iterable): reference distributions, in the same order as counts.
+        num_clbits(int): classical bits of the distributions.
+        metrics(list[str]): names of the distances to compute, keys of DISTANCES.
+        chunk_size(int): distributions converted at once.
+
+    Returns:
+        dict: float[distributions] with each metric.
+    '''
+    def to_array(distribution):
+        if isinstance(distribution, dict):
+            return counts_to_array(distribution, num_clbits)
+        return distribution
+
+    results = {metric: [] for metric in metrics}
+    pairs = zip(counts, reference_counts)
+    while True:
+        chunk = list(itertools.islice(pairs, chunk_size))
+        if not chunk:
+            break
+        chunk_counts = np.stack([to_array(distribution) for distribution, _ in chunk])
+        chunk_references = np.stack([to_array(distribution) for _, distribution in chunk])
+        for metric in metrics:
+            results[metric].append(DISTANCES[metric](chunk_counts, chunk_references))
+
+    return {
+        metric: np.concatenate(values) if values else np.empty(0)
+        for metric, values in results.items()
+    }
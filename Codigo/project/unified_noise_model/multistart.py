@@ -0,0 +1,147 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from scipy.optimize import minimize
+
+try:
+    from .Unified_Noise_Model import Unified_Noise_Model
+    from .cost_evaluation import Cost_Evaluator
+    from .results_store import Results_Store
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from Unified_Noise_Model import Unified_Noise_Model
+    from cost_evaluation import Cost_Evaluator
+    from results_store import Results_Store
+
+# cost evaluator of each worker process, created once by _initWorker
+_evaluator = None
+
+
+def _initWorker(snapshot_path, circuit, cost_table, shots, transpile_options):
+    '''Loads the noise model snapshot and creates the cost evaluator of a worker process.'''
+    global _evaluator
+    unm = Unified_Noise_Model.load_snapshot(snapshot_path)
+    _evaluator = Cost_Evaluator(circuit, cost_table, unm, shots, **transpile_options)
+
+
+def _runRestart(restart, x0, method, tol, options):
+    '''Runs one minimization with the cost evaluator of the worker and returns its record.'''
+    result = minimize(fun=_evaluator, x0=x0, method=method, tol=tol, options=options)
+    return {
+        'restart': restart,
+        'x0': list(x0),
+        'x': result.x.tolist(),
+        'fun': float(result.fun),
+        'nfev': int(result.nfev),
+        'success': bool(result.success),
+    }
+
+
+class Multistart_Minimizer:
+    """Driver of independent minimization restarts of a parametric circuit cost.
+
+    The restarts are spread over a process pool. The noise model is built once and shared with the
+    workers as a snapshot file (see Unified_Noise_Model.save_snapshot), and each finished restart is
+    appended to a results file, so an interrupted study can be resumed without redoing the completed
+    restarts.
+    """
+
+    def __init__(
+        self,
+        circuit,
+        cost_table,
+        snapshot_path,
+        results_path,
+        shots=4000,
+        method='COBYLA',
+        tol=None,
+        options=None,
+        n_workers=None,
+        **transpile_options,
+    ):
+        """Create a multistart minimizer.
+
+        Args:
+            circuit(QuantumCircuit): parametric circuit, with its measurements.
+            cost_table(Dense_Cost_Table or Sparse_Cost_Table): cost table of the outcomes.
+            snapshot_path(str): snapshot of the noise model, saved with unm.save_snapshot(path).
+            results_path(str): file where the restarts are appended, as a Results_Store.
+            shots(int): shots of each cost evaluation.
+            method(str): scipy.optimize.minimize method.
+            tol(float): tolerance of the minimizations.
+            options(dict): options of the minimizations, like {"maxiter": 85000}.
+            n_workers(int): processes which run the restarts. If None, one per core.
+            transpile_options: options for transpile, like coupling_map or initial_layout.
+        """
+        self.circuit = circuit
+        self.cost_table = cost_table
+        self.snapshot_path = snapshot_path
+        self.results_store = Results_Store(results_path)
+        self.shots = shots
+        self.method = method
+        self.tol = tol
+        self.options = options
+        self.n_workers = n_workers
+        self.transpile_options = transpile_options
+
+    def get_initial_points(self, repetitions, seed=None, low=0, high=np.pi):
+        '''Returns float[repetitions][parameters] random initial points, uniform between low and
+        high. The point of each restart only depends on the seed and its index, so a resumed study
+        gets the same points.'''
+        num_parameters = self.circuit.num_parameters
+        return np.array([
+            np.random.default_rng([restart] if seed is None else [seed, restart]).uniform(
+                low, high, num_parameters,
+            )
+            for restart in range(repetitions)
+        ])
+
+    def load_results(self):
+        '''Returns the records of the finished restarts in the results file, as dict[restart].'''
+        # a restart whose line was cut by a crash is not loaded, so it is run again
+        return {record['restart']: record for record in self.results_store}
+
+    def run(self, repetitions=None, initial_points=None, seed=None):
+        '''Runs the restarts not found in the results file.
+
+        Args:
+            repetitions(int): number of restarts, with random initial points (see
+                              get_initial_points).
+            initial_points(array): float[restarts][parameters] initial points, instead of
+                                   repetitions.
+            seed(int): seed of the random initial points.
+
+        Returns:
+            tuple: the optimal parameters, the costs of all the restarts and their parameters, as
+            float[parameters], float[restarts] and float[restarts][parameters].
+        '''
+        if initial_points is None:
+            initial_points = self.get_initial_points(repetitions, seed)
+
+        records = self.load_results()
+        pending = [restart for restart in range(len(initial_points)) if restart not in records]
+
+        if pending:
+            initializer_arguments = (
+                self.snapshot_path, self.circuit, self.cost_table, self.shots,
+                self.transpile_options,
+            )
+            with ProcessPoolExecutor(
+                max_workers=self.n_workers,
+                initializer=_initWorker,
+                initargs=initializer_arguments,
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        _runRestart, restart, list(initial_points[restart]), self.method,
+                        self.tol, self.options,
+                    )
+                    for restart in pending
+                ]
+                for future in as_completed(futures):
+                    record = future.result()
+                    self.results_store.append(record)
+                    records[record['restart']] = record
+
+        scores = np.array([records[restart]['fun'] for restart in range(len(initial_points))])
+        params = np.array([records[restart]['x'] for restart in range(len(initial_points))])
+        return params[np.argmin(scores)], scores, params
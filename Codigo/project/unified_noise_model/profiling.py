@@ -0,0 +1,85 @@
+import functools
+import sys
+
+try:
+    import resource
+except ImportError:
+    # the resource module is only available on Unix
+    resource = None
+
+
+def get_max_rss_mb():
+    '''Returns the max resident set size of the process in MB, or None on the platforms without the
+    resource module, like Windows.'''
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB on linux
+    if sys.platform == 'darwin':
+        return max_rss / 2**20
+    return max_rss / 2**10
+
+
+def profiled(method):
+    '''Decorator that records the calls and time of a method of the model in its stage timings.'''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._profileStage(method.__name__):
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class Profile_Report:
+    """Profiling data of a Unified_Noise_Model, returned by its profile_report method.
+
+    Attributes:
+        stage_timings(dict): calls and total seconds of each construction stage, as
+                             dict[stage] = {'calls': int, 'time': float}. The time of a stage
+                             includes the stages it calls.
+        run_timings(list[dict]): label, wall time and max resident set size (MB, None if it is
+                                 unknown) of the runs recorded with profile_run.
+        channels(dict): errors added to the model ('registered') and distinct error objects
+                        ('distinct'), so registered - distinct were deduplicated.
+        channel_cache(dict): stats of the channel cache, where misses are the channels created and
+                             hits the deduplicated ones. The default cache is shared by all the
+                             models.
+        noise_model_entries(dict): entries of the noise model for each instruction, as
+                                   dict[instruction] = {'local': qubits entries,
+                                   'all_qubit': 0 or 1}.
+        memory(dict): estimated bytes of the fused superoperators of the noise model and, if
+                      requested, of the pickled noise model.
+    """
+
+    def __init__(self, stage_timings, run_timings, channels, channel_cache, noise_model_entries,
+                 memory):
+        self.stage_timings = stage_timings
+        self.run_timings = run_timings
+        self.channels = channels
+        self.channel_cache = channel_cache
+        self.noise_model_entries = noise_model_entries
+        self.memory = memory
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    def print_report(self):
+        print('------------------------------------------------')
+        print('STAGE TIMINGS:')
+        for stage, timing in sorted(self.stage_timings.items(), key=lambda item: -item[1]['time']):
+            print('%-40s %8d calls %10.4f s' % (stage, timing['calls'], timing['time']))
+        print('------------------------------------------------')
+        print('RUNS:')
+        for run in self.run_timings:
+            max_rss = 'unknown' if run['max_rss_mb'] is None else '%.1f' % run['max_rss_mb']
+            print('%-40s %10.4f s %10s MB' % (run['label'], run['wall_time'], max_rss))
+        print('------------------------------------------------')
+        print('CHANNELS:')
+        print(self.channels)
+        print('CHANNEL CACHE:')
+        print(self.channel_cache)
+        print('------------------------------------------------')
+        print('NOISE MODEL ENTRIES:')
+        print(self.noise_model_entries)
+        print('------------------------------------------------')
+        print('MEMORY (bytes):')
+        print(self.memory)
@@ -0,0 +1,97 @@
+import numpy as np
+
+try:
+    from .executors import MAX_DENSE_CLBITS
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from executors import MAX_DENSE_CLBITS
+
+
+def get_measured_qubits(circuit):
+    '''Returns the qubit measured into each clbit of a circuit, list[int] with None for the clbits
+    that are not measured. With a transpiled circuit, these are the physical qubits to pass to
+    Unified_Noise_Model.get_readout_assignment_matrices.'''
+    qubits = [None] * circuit.num_clbits
+    for instruction in circuit.data:
+        if instruction.operation.name == 'measure':
+            clbit = circuit.find_bit(instruction.clbits[0]).index
+            qubits[clbit] = circuit.find_bit(instruction.qubits[0]).index
+
+    return qubits
+
+
+def _applyTensored(counts, matrices):
+    '''Returns the dense count arrays, float[circuits][2**n], after applying a 2x2 matrix to each
+    bit, as row vectors: the matrix matrices[j] acts over the bit j.'''
+    num_bits = len(matrices)
+    if counts.shape[1] != 2**num_bits:
+        raise ValueError(
+            'The count arrays have ' + str(counts.shape[1]) + ' entries, but there are '
+            + str(num_bits) + ' assignment matrices.',
+        )
+
+    # axis 0 is the circuit and the bit j is the axis num_bits - j
+    tensor = counts.reshape((len(counts),) + (2,) * num_bits)
+    for position, matrix in enumerate(matrices):
+        axis = num_bits - position
+        tensor = np.moveaxis(np.moveaxis(tensor, axis, -1) @ matrix, -1, axis)
+
+    return tensor.reshape(len(counts), -1)
+
+
+def apply_readout_errors(counts, assignment_matrices):
+    '''Returns dense count arrays, or probabilities, with the readout errors of the assignment
+    matrices applied, as they would be recorded by a noisy measurement.
+
+    Args:
+        counts(ndarray): float[circuits][2**n] or float[2**n], indexed by the integer value of the
+                         bitstrings.
+        assignment_matrices(ndarray): float[n][2][2], where assignment_matrices[j][i][k] is the
+                                      probability of recording k in the clbit j when its qubit is
+                                      in the state i.
+    '''
+    counts = np.asarray(counts, dtype=float)
+    corrected = _applyTensored(np.atleast_2d(counts), np.asarray(assignment_matrices, dtype=float))
+    return corrected.reshape(counts.shape)
+
+
+def mitigate_counts(counts, assignment_matrices, clip=True):
+    '''Returns the readout mitigated dense count arrays of many circuits, applying the inverse of
+    the assignment matrix of each clbit over its axis of the counts tensor. The cost is
+    O(circuits * n * 2**n), without building the 2**n x 2**n assignment matrix.
+
+    Args:
+        counts(ndarray): int[circuits][2**n] or int[2**n], like the output of run_counts.
+        assignment_matrices(ndarray): float[n][2][2], with the assignment matrix of the qubit
+                                      measured into each clbit, for example
+                                      unm.get_readout_assignment_matrices(qubits) with the qubits
+                                      of get_measured_qubits(circuit).
+        clip(bool): if True, the negative quasi-counts are set to 0 and each row is rescaled to its
+                    original total. Otherwise, the quasi-counts are returned.
+
+    Returns:
+        ndarray: float array with the shape of counts.
+
+    Raises:
+        ValueError: if there are more than MAX_DENSE_CLBITS assignment matrices, or they do not
+                    match the length of the count arrays.
+    '''
+    assignment_matrices = np.asarray(assignment_matrices, dtype=float)
+    if len(assignment_matrices) > MAX_DENSE_CLBITS:
+        raise ValueError(
+            'Too many classical bits (' + str(len(assignment_matrices))
+            + ') for dense count arrays.',
+        )
+
+    counts = np.asarray(counts, dtype=float)
+    rows = np.atleast_2d(counts)
+    mitigated = _applyTensored(rows, np.linalg.inv(assignment_matrices))
+
+    if clip:
+        mitigated = np.clip(mitigated, 0, None)
+        totals = mitigated.sum(axis=1, keepdims=True)
+        mitigated *= np.divide(
+            rows.sum(axis=1, keepdims=True), totals, out=np.zeros_like(totals), where=totals > 0,
+        )
+
+    return mitigated.reshape(counts.shape)
@@ -0,0 +1,80 @@
+import json
+import os
+import numpy as np
+
+
+def _toJson(value):
+    '''Converts the numpy values of a record to json types.'''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('Object of type ' + type(value).__name__ + ' is not JSON serializable')
+
+
+class Results_Store:
+    """Append-only store of experiment results, with one json record per line.
+
+    Each record is written and flushed to disk as soon as it is appended, so the results of a run
+    that fails are kept up to its last record. The records are read back lazily, one line at a time,
+    so a column can be extracted from a large sweep without loading the whole file.
+    """
+
+    def __init__(self, path):
+        """Create a results store over a file, which is created on the first append.
+
+        Args:
+            path(str): path to the results file.
+        """
+        self.path = path
+
+    def append(self, record):
+        '''Appends a record, a dict whose values are json types or numpy arrays and scalars.'''
+        self.extend([record])
+
+    def extend(self, records):
+        '''Appends several records with a single write to disk.'''
+        lines = ''.join(json.dumps(record, default=_toJson) + '\n' for record in records)
+        if self._isLastLineCut():
+            lines = '\n' + lines
+        with open(self.path, 'a') as file:
+            file.write(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def __iter__(self):
+        '''Yields the records of the file in the order they were appended.'''
+        if not os.path.exists(self.path):
+            return
+        with open(self.path) as file:
+            for line in file:
+                # a line cut by a crash is ignored
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def column(self, name, dtype=float):
+        '''Returns the values of a field in all the records that have it, as a numpy array.'''
+        return np.array([record[name] for record in self if name in record], dtype=dtype)
+
+    def columns(self, names, dtype=float):
+        '''Returns the values of several fields, as dict[name] = ndarray, reading the file once.
+        Only the records with all the fields are used.'''
+        values = {name: [] for name in names}
+        for record in self:
+            if all(name in record for name in names):
+                for name in names:
+                    values[name].append(record[name])
+        return {name: np.array(values[name], dtype=dtype) for name in names}
+
+    def _isLastLineCut(self):
+        '''Returns whether the file ends with a line cut by a crash.'''
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return False
+        with open(self.path, 'rb') as file:
+            file.seek(-1, os.SEEK_END)
+            return file.read(1) != b'\n'
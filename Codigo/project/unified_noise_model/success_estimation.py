@@ -0,0 +1,291 @@
+import weakref
+import numpy as np
+from qiskit.circuit import Delay
+
+try:
+    from .Unified_Noise_Model import TIME_UNITS_TO_NS, Unified_Noise_Model
+except ImportError:
+    # imported as a top level module from its directory, like Unified_Noise_Model.py
+    from Unified_Noise_Model import TIME_UNITS_TO_NS, Unified_Noise_Model
+
+# code of the padding, without noise nor duration
+_IDEAL = 0
+# code of the delays, without noise, whose duration is counted as idle time
+_DELAY = 1
+
+
+def _getRelaxationLogFidelities(times, T1s, T2s):
+    '''Returns the log process fidelities of the relaxation and dephasing channels of some qubits
+    during some times, log((1 + exp(-t/T1) + 2*exp(-t/T2)) / 4).'''
+    return np.log((1 + np.exp(-times / T1s) + 2 * np.exp(-times / T2s)) / 4)
+
+
+class Success_Estimator:
+    """Analytic estimator of the success probability of transpiled circuits, computed from the
+    calibration data of a Unified_Noise_Model without simulating them.
+
+    The estimated success probability (ESP) of a circuit is the product of the fidelities of its
+    gates (1 - error rate), of its measurements (1 - measurement error rate) and, optionally, of the
+    relaxation and dephasing of each qubit during its gates and while it is idle in the as soon as
+    possible schedule of the circuit. The fidelities are looked up in tables indexed by instruction
+    and physical qubits, and the circuits of a batch are scheduled together, one instruction of
+    each circuit at a time.
+    """
+
+    def __init__(self, noise_model):
+        """Create an estimator.
+
+        Args:
+            noise_model(Unified_Noise_Model): model with calibration data, which gives the error
+                                              rates, the T1 and T2 and the gates times. The ecr and
+                                              cx gates share the tables of the two qubits gate of
+                                              the calibration data, so the circuits can be
+                                              transpiled to either of them.
+        """
+        qubits = np.asarray(noise_model.qubits)
+        num_qubits = int(qubits.max()) + 1
+        single_qubit_gates = list(noise_model.single_qubit_basis_gates)
+        two_qubits_gates = noise_model.get_noisy_two_qubits_gates()
+
+        # instruction codes, 0 is reserved for the padding and 1 for the delays
+        instructions = single_qubit_gates + two_qubits_gates + ['measure', 'reset']
+        self.instructions = {name: code for code, name in enumerate(instructions, start=2)}
+        self.instructions['delay'] = _DELAY
+        num_codes = len(self.instructions) + 1
+
+        # tables indexed by [code, qubit, second_qubit], with qubit == second_qubit for the single
+        # qubit instructions
+        shape = (num_codes, num_qubits, num_qubits)
+        self._gateLogFidelities = np.zeros(shape)
+        self._readoutLogFidelities = np.zeros(shape)
+        self._durations = np.zeros(shape)
+
+        single_qubit_log_fidelities, readout_log_fidelities, two_qubits_log_fidelities = (
+            noise_model.get_log_fidelities()
+        )
+        if noise_model.readout_lengths is None:
+            times_measure = np.full(len(qubits), 1000.0)  # 1 microsecond
+        else:
+            times_measure = np.asarray(noise_model.readout_lengths, dtype=float)
+        for gate, name in enumerate(single_qubit_gates):
+            code = self.instructions[name]
+            self._gateLogFidelities[code, qubits, qubits] = single_qubit_log_fidelities[qubits]
+            self._durations[code, qubits, qubits] = noise_model.single_qubit_gates_times[:, gate]
+        self._readoutLogFidelities[self.instructions['measure'], qubits, qubits] = (
+            readout_log_fidelities[qubits]
+        )
+        self._durations[self.instructions['measure'], qubits, qubits] = times_measure
+        self._durations[self.instructions['reset'], qubits, qubits] = 1000  # 1 microsecond
+
+        src = noise_model.edges['src']
+        dst = noise_model.edges['dst']
+        for gate, name in enumerate(two_qubits_gates):
+            code = self.instructions[name]
+            times = noise_model.two_qubits_gates_times[:, gate]
+            # both directions, the ones given in the calibration data take precedence
+            for first, second in ((dst, src), (src, dst)):
+                self._gateLogFidelities[code, first, second] = (
+                    two_qubits_log_fidelities[first, second]
+                )
+                self._durations[code, first, second] = times
+
+        # ecr and cx are the same calibrated gate (see get_noisy_two_qubits_gates)
+        for name, alias in (('cx', 'ecr'), ('ecr', 'cx')):
+            if name in self.instructions and alias not in self.instructions:
+                self.instructions[alias] = self.instructions[name]
+
+        # T1 and T2 in nanoseconds, as in add_relaxation_dephasing_channel2
+        self.T1s = np.full(num_qubits, np.inf)
+        self.T2s = np.full(num_qubits, np.inf)
+        self.T1s[qubits] = np.asarray(noise_model.T1s) * 10**9
+        self.T2s[qubits] = np.minimum(noise_model.T2s, 2 * np.asarray(noise_model.T1s)) * 10**9
+
+        # encoded circuits, as dict[id(circuit)] = (weak reference, instructions, encoding)
+        self._encoded = {}
+
+    def encode(self, circuit):
+        '''Returns a transpiled circuit as int arrays with the code, the qubit and the second qubit
+        (the qubit again for single qubit instructions) of each instruction, and a float array
+        with the duration in nanoseconds of each delay (0 for the other instructions).
+
+        The encodings are cached while the circuits are alive, so estimating the same circuits
+        again skips the encoding. A circuit is encoded again if its number of instructions changes,
+        but not if its instructions are replaced in place.
+
+        Raises:
+            ValueError: if the circuit has an instruction over more than two qubits, an instruction
+                        unknown to the model or a delay in dt units.
+        '''
+        key = id(circuit)
+        cached = self._encoded.get(key)
+        if cached is not None and cached[0]() is circuit and cached[1] == len(circuit.data):
+            return cached[2]
+
+        encoded = self._encode(circuit)
+        self._encoded[key] = (
+            weakref.ref(circuit, lambda _: self._encoded.pop(key, None)),
+            len(circuit.data),
+            encoded,
+        )
+        return encoded
+
+    def _encode(self, circuit):
+        '''Returns the encoding of a circuit, see encode.'''
+        names, qubits = Unified_Noise_Model.get_circuit_instructions(circuit)
+        unknown = sorted(set(names) - set(self.instructions))
+        if unknown:
+            raise ValueError(
+                'Unknown instructions ' + ', '.join(unknown) + ', transpile the circuit to the '
+                'basis gates of the model.',
+            )
+        codes = np.fromiter(map(self.instructions.__getitem__, names), np.int64, len(names))
+
+        delays = np.zeros(len(codes))
+        is_delay = codes == _DELAY
+        if is_delay.any():
+            delays[is_delay] = [
+                self._getDelayDuration(instruction.operation) for instruction in circuit.data
+                if isinstance(instruction.operation, Delay)
+            ]
+        return codes, qubits[:, 0], qubits[:, 1], delays
+
+    @staticmethod
+    def _getDelayDuration(delay):
+        '''Returns the duration of a delay in nanoseconds.'''
+        if delay.unit not in TIME_UNITS_TO_NS:
+            raise ValueError(
+                'Unsupported delay unit ' + delay.unit + ', use delays in seconds or nanoseconds.',
+            )
+        return float(delay.duration) * TIME_UNITS_TO_NS[delay.unit]
+
+    def estimate(self, circuits, decoherence=True):
+        '''Returns the estimated success probabilities of a batch of transpiled circuits.
+
+        Args:
+            circuits(QuantumCircuit or list[QuantumCircuit]): circuits transpiled to the basis gates
+                                                              and physical qubits of the model.
+            decoherence(bool): if True, the relaxation and dephasing during the gates, the
+                               measurements and the idle times are included.
+
+        Returns:
+            dict: float[circuits] arrays with the 'esp' and its factors as log fidelities:
+            'gate_log_fidelity', 'readout_log_fidelity', 'decoherence_log_fidelity' (during the
+            instructions) and 'idle_log_fidelity'. With decoherence, 'duration' has the length of
+            the schedule of each circuit in nanoseconds.
+
+        Raises:
+            ValueError: if decoherence is True and the gates times are unknown, or if a circuit
+                        can not be encoded (see encode).
+        '''
+        if not isinstance(circuits, (list, tuple)):
+            circuits = [circuits]
+        encoded = [self.encode(circuit) for circuit in circuits]
+
+        # the circuits are padded with ideal instructions over the qubit 0
+        length = max([len(codes) for codes, _, _, _ in encoded] + [1])
+        codes = np.full((len(circuits), length), _IDEAL)
+        first_qubits = np.zeros((len(circuits), length), dtype=np.int64)
+        second_qubits = np.zeros((len(circuits), length), dtype=np.int64)
+        delays = np.zeros((len(circuits), length))
+        for i, (circuit_codes, circuit_first_qubits, circuit_second_qubits,
+                circuit_delays) in enumerate(encoded):
+            codes[i, :len(circuit_codes)] = circuit_codes
+            first_qubits[i, :len(circuit_codes)] = circuit_first_qubits
+            second_qubits[i, :len(circuit_codes)] = circuit_second_qubits
+            delays[i, :len(circuit_codes)] = circuit_delays
+
+        estimates = {
+            'gate_log_fidelity': self._gateLogFidelities[codes, first_qubits, second_qubits].sum(
+                axis=1,
+            ),
+            'readout_log_fidelity': self._readoutLogFidelities[
+                codes, first_qubits, second_qubits
+            ].sum(axis=1),
+            'decoherence_log_fidelity': np.zeros(len(circuits)),
+            'idle_log_fidelity': np.zeros(len(circuits)),
+        }
+        if decoherence:
+            if np.isnan(self._durations).any():
+                raise ValueError(
+                    'Unknown gates execution times, add the calibration data with the device to '
+                    'simulate or its properties.',
+                )
+            estimates.update(self._getDecoherence(codes, first_qubits, second_qubits, delays))
+
+        estimates['esp'] = np.exp(
+            estimates['gate_log_fidelity'] + estimates['readout_log_fidelity']
+            + estimates['decoherence_log_fidelity'] + estimates['idle_log_fidelity']
+        )
+        return estimates
+
+    def __call__(self, circuits, decoherence=True):
+        '''Returns the estimated success probabilities of the circuits, float[circuits].'''
+        return self.estimate(circuits, decoherence)['esp']
+
+    def _getDecoherence(self, codes, first_qubits, second_qubits, delays):
+        '''Returns the decoherence and idle log fidelities and the durations of padded encoded
+        circuits, int[circuits][instructions], scheduling them as soon as possible. The idle time
+        of a qubit is counted from the end of its first instruction other than a delay, and
+        includes its later delays.'''
+        num_circuits, length = codes.shape
+        is_delay = codes == _DELAY
+        durations = np.where(is_delay, delays, self._durations[codes, first_qubits, second_qubits])
+        two_qubits = first_qubits != second_qubits
+
+        decoherence_log_fidelities = _getRelaxationLogFidelities(
+            durations, self.T1s[first_qubits], self.T2s[first_qubits],
+        ) + np.where(two_qubits, _getRelaxationLogFidelities(
+            durations, self.T1s[second_qubits], self.T2s[second_qubits],
+        ), 0)
+
+        # the decoherence during the delays is idle time
+        delay_log_fidelities = np.where(is_delay, decoherence_log_fidelities, 0)
+        decoherence_log_fidelities = np.where(is_delay, 0, decoherence_log_fidelities)
+
+        # start time of each instruction and end time of the previous instruction of each of its
+        # qubits, the only sequential part of the schedule. The arrays are indexed by
+        # [step, circuit], so each step reads contiguous rows, and the ready time of each qubit of
+        # each circuit is indexed by circuit * qubits + qubit
+        num_qubits = len(self.T1s)
+        offsets = np.arange(num_circuits)[:, np.newaxis] * num_qubits
+        first_indexes = np.ascontiguousarray((first_qubits + offsets).T)
+        second_indexes = np.ascontiguousarray((second_qubits + offsets).T)
+        steps_durations = np.ascontiguousarray(durations.T)
+        ready = np.zeros(num_circuits * num_qubits)
+        starts = np.empty((length, num_circuits))
+        first_ready = np.empty((length, num_circuits))
+        second_ready = np.empty((length, num_circuits))
+        for step in range(length):
+            first, second = first_indexes[step], second_indexes[step]
+            ready.take(first, out=first_ready[step])
+            ready.take(second, out=second_ready[step])
+            start = np.maximum(first_ready[step], second_ready[step], out=starts[step])
+            end = start + steps_durations[step]
+            ready[first] = end
+            ready[second] = end
+
+        # a qubit is started from the end of its first instruction other than a delay, the padding
+        # does not start the qubit 0
+        steps = np.broadcast_to(np.arange(length), (num_circuits, length)).T
+        active = ((codes != _IDEAL) & ~is_delay).T
+        first_active_steps = np.full(num_circuits * num_qubits, length)
+        np.minimum.at(first_active_steps, first_indexes[active], steps[active])
+        np.minimum.at(first_active_steps, second_indexes[active], steps[active])
+        first_started = (first_active_steps[first_indexes] < steps).T
+        second_started = (first_active_steps[second_indexes] < steps).T & two_qubits
+
+        first_idle = np.where(first_started, (starts - first_ready).T, 0)
+        second_idle = np.where(second_started, (starts - second_ready).T, 0)
+        idle_log_fidelities = (
+            _getRelaxationLogFidelities(first_idle, self.T1s[first_qubits], self.T2s[first_qubits])
+            + _getRelaxationLogFidelities(
+                second_idle, self.T1s[second_qubits], self.T2s[second_qubits],
+            )
+            + np.where(first_started, delay_log_fidelities, 0)
+        )
+
+        return {
+            'decoherence_log_fidelity': decoherence_log_fidelities.sum(axis=1),
+            'idle_log_fidelity': idle_log_fidelities.sum(axis=1),
+            'duration': ready.reshape(num_circuits, num_qubits).max(axis=1),
+        }
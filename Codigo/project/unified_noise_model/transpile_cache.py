@@ -0,0 +1,179 @@
+from qiskit import qpy, transpile
+from qiskit.circuit import ClassicalRegister, Clbit, ParameterExpression
+from qiskit.circuit.library import get_standard_gate_name_mapping
+import hashlib
+import os
+from collections import OrderedDict
+import numpy as np
+
+# names of the standard instructions, whose definitions are not hashed
+STANDARD_INSTRUCTIONS = frozenset(get_standard_gate_name_mapping())
+
+
+class Transpile_Cache:
+    """Cache of transpiled circuits.
+
+    The circuits are cached by the hash of their structure (the instructions, their parameters and
+    their qubits and clbits, with the custom gates hashed by their definitions instead of their
+    generated names), the basis gates, the coupling map, the optimization level and the other
+    transpile options, in an in-memory LRU and optionally
+    in a directory of qpy files, which is shared between sessions and processes.
+    """
+
+    def __init__(self, maxsize=128, directory=None):
+        """Create a transpile cache.
+
+        Args:
+            maxsize(int): maximum number of transpiled circuits kept in memory.
+            directory(str): directory of the on-disk tier. If None, only the memory is used.
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        self._circuits = OrderedDict()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def stats(self):
+        '''Returns a dict with the hits (in memory), disk hits, misses and size of the cache.'''
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'size': len(self._circuits),
+            'maxsize': self.maxsize,
+        }
+
+    def clear(self):
+        '''Removes the circuits of the memory. The on-disk tier is kept.'''
+        self._circuits.clear()
+
+    def transpile(self, circuit, basis_gates=None, coupling_map=None, optimization_level=1,
+                  **transpile_options):
+        '''Returns transpile(circuit, ...), from the cache if it was already transpiled with the
+        same options. A copy is returned, so it can be modified without changing the cache, with the
+        name and metadata of the given circuit.'''
+        key = self._getKey(
+            circuit, basis_gates, coupling_map, optimization_level, transpile_options,
+        )
+
+        if key in self._circuits:
+            self.hits += 1
+            self._circuits.move_to_end(key)
+            return self._getCopy(self._circuits[key], circuit)
+
+        path = None if self.directory is None else os.path.join(self.directory, key + '.qpy')
+        if path is not None and os.path.exists(path):
+            self.disk_hits += 1
+            with open(path, 'rb') as file:
+                transpiled_circuit = qpy.load(file)[0]
+        else:
+            self.misses += 1
+            transpiled_circuit = transpile(
+                circuit,
+                basis_gates=basis_gates,
+                coupling_map=coupling_map,
+                optimization_level=optimization_level,
+                **transpile_options,
+            )
+            if path is not None:
+                with open(path, 'wb') as file:
+                    qpy.dump(transpiled_circuit, file)
+
+        self._circuits[key] = transpiled_circuit
+        if len(self._circuits) > self.maxsize:
+            self._circuits.popitem(last=False)
+        return self._getCopy(transpiled_circuit, circuit)
+
+    @staticmethod
+    def _getCopy(transpiled_circuit, circuit):
+        '''Returns a copy of a cached transpiled circuit with the name and metadata of circuit, as
+        it can come from another circuit with the same structure.'''
+        transpiled_circuit = transpiled_circuit.copy()
+        transpiled_circuit.name = circuit.name
+        transpiled_circuit.metadata = circuit.metadata
+        return transpiled_circuit
+
+    def _getKey(self, circuit, basis_gates, coupling_map, optimization_level, transpile_options):
+        '''Returns the sha256 hash of the circuit structure and the transpile options.'''
+        if coupling_map is not None and hasattr(coupling_map, 'get_edges'):
+            coupling_map = coupling_map.get_edges()
+        options = (
+            None if basis_gates is None else list(basis_gates),
+            None if coupling_map is None else [list(edge) for edge in coupling_map],
+            optimization_level,
+            sorted((name, repr(value)) for name, value in transpile_options.items()),
+        )
+
+        key = hashlib.sha256(repr(self._getCircuitStructure(circuit)).encode())
+        key.update(repr(options).encode())
+        return key.hexdigest()
+
+    def _getCircuitStructure(self, circuit):
+        '''Returns the structure of a circuit as nested tuples: its registers, its global phase and
+        each instruction with its qubits and clbits indexes.'''
+        qubits_index = {qubit: i for i, qubit in enumerate(circuit.qubits)}
+        clbits_index = {clbit: i for i, clbit in enumerate(circuit.clbits)}
+        instructions = tuple(
+            (
+                self._getOperationStructure(instruction.operation, clbits_index),
+                tuple(qubits_index[qubit] for qubit in instruction.qubits),
+                tuple(clbits_index[clbit] for clbit in instruction.clbits),
+            )
+            for instruction in circuit.data
+        )
+        return (
+            tuple((register.name, register.size) for register in circuit.qregs),
+            tuple((register.name, register.size) for register in circuit.cregs),
+            len(circuit.qubits),
+            len(circuit.clbits),
+            self._getParameterStructure(circuit.global_phase),
+            instructions,
+        )
+
+    def _getOperationStructure(self, operation, clbits_index):
+        '''Returns the structure of an operation. The custom gates, whose names can be generated,
+        like the ones of the multi controlled gates, are described by their definitions.'''
+        params = tuple(self._getParameterStructure(param) for param in operation.params)
+        condition = getattr(operation, 'condition', None)
+        if condition is not None:
+            target, value = condition
+            if isinstance(target, ClassicalRegister):
+                target = (target.name, target.size)
+            elif isinstance(target, Clbit):
+                target = clbits_index[target]
+            condition = (repr(target), value)
+        structure = (params, condition, getattr(operation, 'unit', None))
+
+        blocks = getattr(operation, 'blocks', None)
+        if blocks:
+            return (operation.name, structure) + tuple(
+                self._getCircuitStructure(block) for block in blocks
+            )
+        if operation.name in STANDARD_INSTRUCTIONS or operation.definition is None:
+            return (operation.name, structure)
+        return (
+            'custom', operation.num_qubits, operation.num_clbits, structure,
+            self._getCircuitStructure(operation.definition),
+        )
+
+    @staticmethod
+    def _getParameterStructure(param):
+        '''Returns the structure of a parameter of an operation. The free parameters are described
+        by their names and uuids, as different Parameter objects can have the same name.'''
+        if isinstance(param, ParameterExpression):
+            return (str(param), tuple(sorted(
+                (parameter.name, str(getattr(parameter, 'uuid', getattr(parameter, '_uuid', None))))
+                for parameter in param.parameters
+            )))
+        if isinstance(param, np.ndarray):
+            return (param.shape, str(param.dtype), hashlib.sha256(param.tobytes()).hexdigest())
+        return repr(param)
+
+
+# transpile cache shared by all the models
+default_transpile_cache = Transpile_Cache()
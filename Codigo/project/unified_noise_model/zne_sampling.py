@@ -0,0 +1,180 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from mitiq.zne.scaling import fold_gates_at_random
+
+try:
+    from .executors import bitstring_to_index
+except ImportError:
+    # imported as a top level module from its directory, like in the conference notebook
+    from executors import bitstring_to_index
+
+
+def _foldCircuits(circuit, scale_factors, num_to_average, scale_noise, seeds):
+    '''Returns the folded circuits of one sample, num_to_average circuits for each scale factor.'''
+    circuits = []
+    for scale_factor in scale_factors:
+        for i in range(num_to_average):
+            if seeds is None:
+                circuits.append(scale_noise(circuit, scale_factor))
+            else:
+                circuits.append(scale_noise(circuit, scale_factor, seed=int(seeds[i])))
+
+    return circuits
+
+
+class ZNE_Sampler:
+    """Sampling engine for zero noise extrapolation experiments.
+
+    Instead of running mitiq's execute_with_zne once per sample, the folded circuits of all the
+    samples are generated up front (optionally in a process pool), executed as batched
+    simulator.run calls and extrapolated afterwards with the factory.
+    """
+
+    def __init__(
+        self,
+        simulator,
+        factory,
+        shots,
+        observable,
+        scale_noise=fold_gates_at_random,
+        num_to_average=1,
+        batch_size=None,
+        n_workers=1,
+    ):
+        """Create a ZNE sampler.
+
+        Args:
+            simulator(AerSimulator): simulator which runs the folded circuits, for example
+                                     AerSimulator(noise_model=unm.noise_model). Its
+                                     max_parallel_experiments option sets how many circuits of a
+                                     batch are simulated in parallel (0 for all the cores).
+            factory(BatchedFactory): mitiq factory used for the extrapolations.
+            shots(int): shots of each folded circuit.
+            observable(str): bitstring whose counts are the expectation values.
+            scale_noise(function): mitiq noise scaling function.
+            num_to_average(int): folded circuits executed, and averaged, for each scale factor.
+            batch_size(int): maximum amount of circuits of each simulator.run call. If None, all
+                             the circuits are run in a single call.
+            n_workers(int): processes used to fold the circuits.
+        """
+        self.simulator = simulator
+        self.factory = factory
+        self.shots = shots
+        self.observable = observable
+        self.scale_noise = scale_noise
+        self.num_to_average = num_to_average
+        self.batch_size = batch_size
+        self.n_workers = n_workers
+
+        # the factory is run with the identity to get its scale factors
+        self.scale_factors = factory.run_classical(
+            lambda scale_factor: scale_factor,
+        ).get_scale_factors()
+
+    def fold_circuits(self, circuit, n_sample, seed=None):
+        '''Returns the folded circuits of all the samples, as a list ordered by sample, scale factor
+        and repetition.'''
+        return self._foldSamples(circuit, self._getSeeds(n_sample, seed))
+
+    def _getSeeds(self, n_sample, seed):
+        '''Returns the folding seeds of each sample, derived from the seed.'''
+        if seed is None:
+            return [None] * n_sample
+        return np.random.default_rng(seed).integers(2**31, size=(n_sample, self.num_to_average))
+
+    def _foldSamples(self, circuit, seeds):
+        '''Returns the folded circuits of the samples with the given folding seeds.'''
+        arguments = [
+            (circuit, self.scale_factors, self.num_to_average, self.scale_noise, sample_seeds)
+            for sample_seeds in seeds
+        ]
+        if self.n_workers > 1:
+            with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+                samples = list(executor.map(_foldCircuits, *zip(*arguments)))
+        else:
+            samples = [_foldCircuits(*sample_arguments) for sample_arguments in arguments]
+
+        return [folded_circuit for sample in samples for folded_circuit in sample]
+
+    def run_circuits(self, circuits):
+        '''Runs the circuits in batched simulator.run calls and returns the counts of the
+        observable for each one. The counts are read from the hexadecimal keys of the Aer results,
+        without building dense count arrays.'''
+        batch_size = self.batch_size or len(circuits)
+        key = hex(bitstring_to_index(self.observable))
+        values = np.empty(len(circuits))
+        for start in range(0, len(circuits), batch_size):
+            batch = circuits[start:start + batch_size]
+            result = self.simulator.run(batch, shots=self.shots).result()
+            values[start:start + len(batch)] = [
+                result.data(i).get('counts', {}).get(key, 0) for i in range(len(batch))
+            ]
+
+        return values
+
+    def extrapolate(self, expectation_values):
+        '''Returns the extrapolation of the expectation values of one sample. After it, the factory
+        holds this sample, so factory.plot_fit() can be used.'''
+        values = iter(expectation_values)
+        self.factory.run_classical(lambda scale_factor: next(values))
+        return self.factory.reduce()
+
+    def run(self, circuit, n_sample, seed=None, store=None):
+        '''Runs n_sample ZNE experiments of the circuit.
+
+        Args:
+            circuit(QuantumCircuit): circuit to fold and run.
+            n_sample(int): number of ZNE experiments.
+            seed(int): seed of the folding.
+            store(Results_Store): if given, each sample is appended to it as a record with fields
+                                  'sample', 'expectation_values' and 'extrapolation' when its
+                                  batch finishes, and the samples already in it are not run again.
+
+        Returns:
+            dict: 'expectation_values', float[n_sample][scale_factors] with the averaged counts of
+            the observable, and 'extrapolations', float[n_sample] with the zero noise limits.
+        '''
+        seeds = self._getSeeds(n_sample, seed)
+        records = {} if store is None else {
+            record['sample']: record for record in store if 'sample' in record
+        }
+        pending = [sample for sample in range(n_sample) if sample not in records]
+
+        # with a store, the samples are run in batches of batch_size circuits, so they are recorded
+        # as they finish
+        samples_per_batch = len(pending) or 1
+        if store is not None and self.batch_size is not None:
+            circuits_per_sample = len(self.scale_factors) * self.num_to_average
+            samples_per_batch = max(1, self.batch_size // circuits_per_sample)
+
+        for start in range(0, len(pending), samples_per_batch):
+            samples = pending[start:start + samples_per_batch]
+            values = self.run_circuits(
+                self._foldSamples(circuit, [seeds[sample] for sample in samples]),
+            )
+            batch_expectation_values = values.reshape(
+                (len(samples), len(self.scale_factors), self.num_to_average),
+            ).mean(axis=2)
+
+            batch_records = [
+                {
+                    'sample': sample,
+                    'expectation_values': sample_expectation_values.tolist(),
+                    'extrapolation': float(self.extrapolate(sample_expectation_values)),
+                }
+                for sample, sample_expectation_values in zip(samples, batch_expectation_values)
+            ]
+            records.update((record['sample'], record) for record in batch_records)
+            if store is not None:
+                store.extend(batch_records)
+
+        expectation_values = np.array(
+            [records[sample]['expectation_values'] for sample in range(n_sample)],
+        )
+        extrapolations = np.array([records[sample]['extrapolation'] for sample in range(n_sample)])
+
+        return {
+            'scale_factors': list(self.scale_factors),
+            'expectation_values': expectation_values,
+            'extrapolations': extrapolations,
+        }